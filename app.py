@@ -1,11 +1,25 @@
 import os
+from math import ceil
+from urllib.parse import quote
 
-from flask import Flask, render_template, redirect, request, g, session, flash
+import click
+from flask import Flask, render_template, redirect, request, g, session, flash, jsonify, abort, send_file
+from flask_migrate import Migrate
 
-from models import db, connect_db, Category, User, Review
+from models import db, connect_db, User, Review
 from forms import NewUser, LoginForm, ReviewForm, EditUserForm
 
-from helpers import get_game_categories, get_category_names, get_videos_for_game, fix_video_embed_link, main_request, get_likes, add_or_remove_like, get_reviews_by_game, get_reviews_by_user, get_latest_reviews_by_user, authorized
+from helpers import get_game_categories, get_category_names, get_videos_for_game, fix_video_embed_link, fetch_listing_page, search_games_locally, get_games_by_ids, get_likes, get_liked_list, get_similar_games, get_recommended_games, invalidate_likes, toggle_like, apply_like_operations, valid_game_id, get_current_user, invalidate_current_user, get_reviews_by_game, get_reviews_by_user, get_latest_reviews_by_user, authorized
+from fanout import submit, deadline_after, result_by
+from search_index import autocomplete
+from stats import leaderboard_page, get_game_stats, record_review_added, record_review_deleted, record_user_deleted, refresh_latest_review, rebuild_game_stats
+from recommend import refresh_neighbors
+from fragments import render_game_card, server_timing
+from pagecache import cache_anonymous_page
+from compression import compress_response
+from assets import hash_static_files, STATIC_MAX_AGE
+from images import IMAGE_SIZES, IMAGE_ERRORS, cached_image_file, get_image_file
+from catalog import search_catalog, sync_catalog, get_category_map, get_category_id
 
 
 CURR_USER = "curr_user"
@@ -20,15 +34,84 @@ app.config["SQLALCHEMY_ECHO"] = True
 app.config["SECRET_KEY"] = os.environ.get('SECRET_KEY', "keep it secret, keep it safe")
 
 connect_db(app)
-db.create_all()
+# the schema is managed with migrations; run `flask db upgrade` before starting the app
+migrate = Migrate(app, db)
 
-#if the categories table is empty, run get_game_categories to fetch the API categories data
-if db.session.query(Category).first() == None:
-    get_game_categories()
+# listing cards are rendered through the fragment cache
+app.add_template_global(render_game_card, 'game_card')
 
 
-base_url = 'https://api.boardgameatlas.com/api'
-client_id = 'Vk9QEJ2umU'
+@app.before_first_request
+def load_categories():
+    """Load the category map for this worker; if the categories table is empty, run get_game_categories to fetch the API categories data"""
+    if not get_category_map():
+        get_game_categories()
+
+
+# content hashes of the files in /static, taken once at startup; a deploy changes them
+static_hashes = hash_static_files(app.static_folder)
+
+
+@app.url_defaults
+def add_static_hash(endpoint, values):
+    """Add a content hash to url_for('static', ...) URLs, so they can be cached for a year
+    and still change whenever the file does"""
+    if endpoint == 'static' and 'filename' in values:
+        digest = static_hashes.get(values['filename'])
+        if digest:
+            values.setdefault('v', digest)
+
+
+@app.after_request
+def cache_fingerprinted_static(response):
+    """Let browsers keep static files requested with their current content hash for a year"""
+    if (request.endpoint == 'static' and response.status_code == 200
+            and request.args.get('v') == static_hashes.get(request.view_args.get('filename'))):
+        response.headers['Cache-Control'] = f'public, max-age={STATIC_MAX_AGE}, immutable'
+    return response
+
+
+@app.after_request
+def compress_large_responses(response):
+    """Gzip (or brotli, when installed) responses large enough to be worth it, if the client accepts it"""
+    return compress_response(response, request.accept_encodings)
+
+
+@app.after_request
+def add_card_timing(response):
+    """Report time spent on game cards, and the time the fragment cache saved, in a Server-Timing header"""
+    timing = g.get('card_timing')
+    if timing:
+        response.headers['Server-Timing'] = server_timing(timing)
+    return response
+
+
+@app.cli.command('sync-games')
+@click.option('--max-games', default=5000, help='How many of the top ranked games to mirror')
+def sync_games_command(max_games):
+    """Mirror the BGA ranked catalog into the local games table"""
+    # games only link to categories that are already in the table, so load them first on a fresh install
+    if not get_category_map():
+        get_game_categories()
+    synced = sync_catalog(max_games)
+    click.echo(f'Synced {synced} games.')
+
+
+@app.cli.command('rebuild-game-stats')
+def rebuild_game_stats_command():
+    """Recompute the game_stats table from likes and reviews"""
+    count = rebuild_game_stats()
+    db.session.commit()
+    click.echo(f'Rebuilt stats for {count} games.')
+
+
+@app.cli.command('refresh-recommendations')
+@click.option('--full', is_flag=True, help='Recompute every game instead of only those whose likes changed')
+def refresh_recommendations_command(full):
+    """Recompute the game_neighbors table behind the recommendation strips"""
+    count = refresh_neighbors(full=full)
+    click.echo(f'Refreshed neighbours for {count} games.')
+
 
 ############################################################################################
 # SEARCH ROUTES for API
@@ -50,24 +133,28 @@ limit = 12
 #     return render_template('search_results.html', games=games, category_dict=category_dict, game_ids_list=game_ids_list, type='Rated')
 
 
-@app.route('/games/<int:num>/Rated')
+@app.route('/games/<int(min=1):num>/Rated')
+@cache_anonymous_page
 def show_top_games_pages(num):
     """Get game data from BGA based on its rank and display in groups of 24"""
 
     g.page_count = num
 
-    resp = main_request(base_url, f'/search/?order_by=rank&limit={limit}&skip={limit * (num-1)}&client_id={client_id}')
+    resp = (search_catalog(num, limit, cursor=request.args.get('cursor'))
+            or fetch_listing_page('order_by=rank', num, limit))
 
     games = None
 
     if resp:
         games = resp[0];
         count = resp[1]
+        cursors = resp[2] if len(resp) > 2 else {}
         category_dict = get_category_names(games)
-        game_ids_list = get_likes(g.user)
+        liked_ids = get_likes(g.user)
+        stats = get_game_stats([game['id'] for game in games])
         
     if games:
-        return render_template('search_results.html', games=games, category_dict=category_dict, game_ids_list=game_ids_list, type='Rated', count=count)
+        return render_template('search_results.html', games=games, category_dict=category_dict, liked_ids=liked_ids, type='Rated', count=count, limit=limit, cursors=cursors, stats=stats)
     else:
         return redirect('/error')
 
@@ -88,29 +175,33 @@ def show_top_games_pages(num):
 #     return render_template('search_results.html', games=games, game_ids_list=game_ids_list, category_dict=category_dict, type=category_name)
 
 
-@app.route('/games/<int:num>/<category_name>')
+@app.route('/games/<int(min=1):num>/<category_name>')
+@cache_anonymous_page
 def show_games_in_category_pages(category_name, num):
     """Show top 24 games in a specific category"""
 
     g.page_count = num
 
-    category = Category.query.filter_by(name=category_name).first()
+    category_id = get_category_id(category_name)
     
-    if not category:
+    if not category_id:
         return redirect('/error')
 
-    resp = main_request(base_url, f'/search/?categories={category.id}&limit={limit}&skip={limit * num}&order_by=rank&client_id={client_id}')
+    resp = (search_catalog(num, limit, category_id=category_id, cursor=request.args.get('cursor'))
+            or fetch_listing_page(f'categories={category_id}&order_by=rank', num, limit))
 
     games = None
 
     if resp:
         games = resp[0];
         count = resp[1]
+        cursors = resp[2] if len(resp) > 2 else {}
         category_dict = get_category_names(games)
-        game_ids_list = get_likes(g.user)
+        liked_ids = get_likes(g.user)
+        stats = get_game_stats([game['id'] for game in games])
 
     if games:
-        return render_template('search_results.html', games=games, game_ids_list=game_ids_list, category_dict=category_dict, type=category_name, count=count)
+        return render_template('search_results.html', games=games, liked_ids=liked_ids, category_dict=category_dict, type=category_name, count=count, limit=limit, cursors=cursors, stats=stats)
     else:
         return redirect('/error')
 
@@ -129,75 +220,117 @@ def show_games_in_category_pages(category_name, num):
 #     return render_template('search_results.html', games=games, game_ids_list=game_ids_list, category_dict=category_dict, type=f'player_count_{players}')
 
 
-@app.route('/games/<int:num>/player_count_<int:players>')
+@app.route('/games/<int(min=1):num>/player_count_<int:players>')
+@cache_anonymous_page
 def show_games_by_player_count_pages(players, num):
     """Show top ranked games based on minimum number of players"""
 
     g.page_count = num
 
-    resp = main_request(base_url, f'/search/?min_players={players}&order_by=rank&limit={limit}&skip={limit*num}&client_id={client_id}')
+    resp = (search_catalog(num, limit, min_players=players, cursor=request.args.get('cursor'))
+            or fetch_listing_page(f'min_players={players}&order_by=rank', num, limit))
 
     games = None
 
     if resp:
         games = resp[0];
         count = resp[1]
+        cursors = resp[2] if len(resp) > 2 else {}
         category_dict = get_category_names(games)
-        game_ids_list = get_likes(g.user)
+        liked_ids = get_likes(g.user)
+        stats = get_game_stats([game['id'] for game in games])
 
     if games:
-        return render_template('search_results.html', games=games, game_ids_list=game_ids_list, category_dict=category_dict, type=f'player_count_{players}', count=count)
+        return render_template('search_results.html', games=games, liked_ids=liked_ids, category_dict=category_dict, type=f'player_count_{players}', count=count, limit=limit, cursors=cursors, stats=stats)
     else:
         return redirect('/error')
 
 
-@app.route('/games/<int:num>/player_min_<int:min_player>&player_max_<int:max_player>')
+@app.route('/games/<int(min=1):num>/player_min_<int:min_player>&player_max_<int:max_player>')
+@cache_anonymous_page
 def show_games_by_player_range(min_player, max_player, num):
     """Show top ranked games based on min and max player range"""
 
     g.page_count = num
 
-    resp = main_request(base_url, f'/search/?min_players={min_player}&max_players={max_player}&limit={limit}&skip={limit*num}&order_by=rank&client_id={client_id}')
+    resp = (search_catalog(num, limit, min_players=min_player, max_players=max_player, cursor=request.args.get('cursor'))
+            or fetch_listing_page(f'min_players={min_player}&max_players={max_player}&order_by=rank', num, limit))
 
     games = None
 
     if resp:
         games = resp[0];
         count = resp[1]
+        cursors = resp[2] if len(resp) > 2 else {}
         category_dict = get_category_names(games)
-        game_ids_list = get_likes(g.user)
+        liked_ids = get_likes(g.user)
+        stats = get_game_stats([game['id'] for game in games])
+
+    if games:
+        return render_template('search_results.html', games=games, liked_ids=liked_ids, category_dict=category_dict, type=f'player_min_{min_player}&player_max_{max_player}', count=count, limit=limit, cursors=cursors, stats=stats)
+    else:
+        return redirect('/error')
+
+@app.route('/games/<int(min=1):num>/Trending', defaults={'board': 'Trending'})
+@app.route('/games/<int(min=1):num>/MostLiked', defaults={'board': 'MostLiked'})
+@cache_anonymous_page
+def show_leaderboard_pages(num, board):
+    """Show games ranked by this site's own likes and reviews: recent activity for Trending,
+    all-time likes for MostLiked; read in order from the precomputed game_stats table"""
+
+    g.page_count = num
+
+    resp = leaderboard_page(board, num, limit, cursor=request.args.get('cursor'))
+
+    if not resp:
+        flash('No community activity yet; here are the top rated games instead.', 'info')
+        return redirect('/games/1/Rated')
+
+    game_ids, count, cursors = resp
+    games = get_games_by_ids(game_ids)
 
     if games:
-        return render_template('search_results.html', games=games, game_ids_list=game_ids_list, category_dict=category_dict, type=f'player_min_{min_player}&player_max_{max_player}', count=count)
+        category_dict = get_category_names(games)
+        liked_ids = get_likes(g.user)
+        stats = get_game_stats(game_ids)
+        return render_template('search_results.html', games=games, liked_ids=liked_ids, category_dict=category_dict, type=board, count=count, limit=limit, cursors=cursors, stats=stats)
     else:
         return redirect('/error')
 
-@app.route('/games/<int:num>/name')
+
+@app.route('/games/<int(min=1):num>/name')
+@cache_anonymous_page
 def search_games_by_name(num):
-    """Search the API by game name, return first 24 to match the name OR, if search form is empty, return top 24 games"""
+    """Search games by name, return first 24 to match the name OR, if search form is empty, return top 24 games;
+    answered from the local name index, falling back to the API only when nothing local matches"""
     query = request.args.get('query')
     query_string = f'name?query={query}'
 
     g.page_count = num
 
-    if query == '':
-        resp = main_request(base_url, f'/search?limit={limit}&skip={limit*num}&client_id={client_id}')
+    if not query:
+        resp = (search_catalog(num, limit, cursor=request.args.get('cursor'))
+                or fetch_listing_page('', num, limit))
     else:
-        resp = main_request(base_url, f'/search/?name={query}&fuzzy_match=true&limit={limit}&skip={limit*num}&client_id={client_id}')
+        resp = (search_games_locally(query, num, limit)
+                or fetch_listing_page(f'name={quote(query)}&fuzzy_match=true', num, limit))
 
     games = None
 
     if resp:
         games = resp[0];
         count = resp[1]
+        cursors = resp[2] if len(resp) > 2 else {}
         category_dict = get_category_names(games)
-        game_ids_list = get_likes(g.user)
+        liked_ids = get_likes(g.user)
+        stats = get_game_stats([game['id'] for game in games])
 
     if games:
-        return render_template('search_results.html', games=games, game_ids_list=game_ids_list, category_dict=category_dict, type=query_string, count=count)
+        return render_template('search_results.html', games=games, liked_ids=liked_ids, category_dict=category_dict, type=query_string, count=count, limit=limit, cursors=cursors, stats=stats)
     else:
         return redirect('/error')
 
+
 @app.route('/error')
 def error_page():
     return render_template('404.html')
@@ -208,29 +341,140 @@ def page_not_found(e):
 
 
 
+############################################################################################
+# JSON API ROUTES
+############################################################################################
+
+@app.route('/api/autocomplete')
+def autocomplete_game_names():
+    """Return the most popular mirrored games whose names start with the q query parameter, as JSON"""
+    prefix = request.args.get('q', '')
+    k = min(max(request.args.get('limit', 8, type=int), 1), 20)
+
+    results = [{'id': id, 'name': name, 'rank': rank} for id, name, rank in autocomplete(prefix, k)]
+
+    return jsonify(results=results)
+
+
+@app.route('/api/like_game/<game_id>', methods=['POST'])
+def like_game_json(game_id):
+    """Logged in user may like or unlike a game; returns the new like state as JSON"""
+    if not g.user:
+        return jsonify(error='Access unauthorized.'), 401
+    if not valid_game_id(game_id):
+        return jsonify(error='Game not found.'), 404
+
+    liked = toggle_like(g.user.username, game_id)
+    db.session.commit()
+    invalidate_likes(g.user.username)
+
+    return jsonify(game_id=game_id, liked=liked)
+
+
+# most operations accepted by one bulk like request
+MAX_BULK_LIKE_OPERATIONS = 1000
+
+
+@app.route('/api/likes/bulk', methods=['POST'])
+def bulk_like_games():
+    """Apply a batch of like/unlike operations for the logged in user in one transaction;
+    expects JSON like {"operations": [{"op": "add", "game_id": "..."}, {"op": "remove", "game_id": "..."}]}
+    and returns the resulting liked game ids as JSON"""
+    if not g.user:
+        return jsonify(error='Access unauthorized.'), 401
+
+    data = request.get_json(silent=True) or {}
+    operations = data.get('operations')
+
+    if (not isinstance(operations, list)
+            or len(operations) > MAX_BULK_LIKE_OPERATIONS
+            or not all(isinstance(operation, dict)
+                       and operation.get('op') in ('add', 'remove')
+                       and valid_game_id(operation.get('game_id'))
+                       for operation in operations)):
+        return jsonify(error=f'Expected up to {MAX_BULK_LIKE_OPERATIONS} operations of the form {{"op": "add" or "remove", "game_id": "..."}}.'), 400
+
+    liked = apply_like_operations(g.user.username, operations)
+    db.session.commit()
+    invalidate_likes(g.user.username)
+
+    return jsonify(liked=sorted(liked))
+
+
+############################################################################################
+# IMAGE PROXY
+############################################################################################
+# resized images rarely change; browsers may keep them for 30 days
+IMAGE_MAX_AGE = 60 * 60 * 24 * 30
+
+
+@app.route('/img/<game_id>/<size>')
+def game_image(game_id, size):
+    """Serve a game's image shrunk to one of the fixed IMAGE_SIZES from the on-disk image cache;
+    falls back to redirecting to the full-size upstream image if it cannot be fetched or resized"""
+    if size not in IMAGE_SIZES or not valid_game_id(game_id):
+        abort(404)
+
+    path = cached_image_file(game_id, size)
+    if path is None:
+        # looked up by every request, not just the one that downloads, so all of them can fall back
+        games = get_games_by_ids([game_id])
+        image_url = games[0].get('image_url') if games else None
+        if not image_url:
+            abort(404)
+
+        try:
+            path = get_image_file(game_id, size, image_url)
+        except IMAGE_ERRORS:
+            app.logger.exception('Could not cache the image for game %s', game_id)
+            return redirect(image_url)
+
+    return send_file(path, mimetype='image/jpeg', max_age=IMAGE_MAX_AGE)
+
+
 ############################################################################################
 # DISPLAY ROUTES
 ############################################################################################
 
+# seconds the game page waits on secondary fetches such as videos
+GAME_PAGE_DEADLINE = float(os.environ.get('GAME_PAGE_DEADLINE', 1.5))
+# seconds the game page waits on the game lookup itself
+GAME_LOOKUP_TIMEOUT = float(os.environ.get('GAME_LOOKUP_TIMEOUT', 15))
+# liked games shown per page on a user's profile
+LIKED_PAGE_SIZE = 12
+
 @app.route('/games/game/<game_id>', methods=['GET', 'POST'])
+@cache_anonymous_page
 def show_game_page(game_id):
     """Show info page for individual game;
     If registered, show form to leave review for game and handle form submit"""
 
-    form=ReviewForm()
+    # only logged in users get the review form; building it for anyone else would put a
+    # CSRF token in their session and keep them out of the anonymous page cache
+    form = ReviewForm() if g.user else None
 
-    resp = main_request(base_url, f'/search/?ids={game_id}&client_id={client_id}')
+    # fetch the game and its videos concurrently while the reviews and likes are read here
+    deadline = deadline_after(GAME_PAGE_DEADLINE)
+    games_future = submit(get_games_by_ids, [game_id])
+    videos_future = submit(get_videos_for_game, game_id)
+    similar_future = submit(get_similar_games, game_id)
 
-    games = resp[0]
-    
-    category_dict = get_category_names(games)
-    game = games[0]
+    liked_ids = get_likes(g.user)
 
-    videos = fix_video_embed_link(get_videos_for_game(game_id))
+    reviews, review_cursors = get_reviews_by_game(game_id, request.args.get('cursor'))
 
-    game_ids_list = get_likes(g.user)
+    # the game itself is required, so wait out the upstream timeouts for it
+    games = result_by(games_future, deadline_after(GAME_LOOKUP_TIMEOUT), default=[])
 
-    reviews = get_reviews_by_game(game_id)
+    if not games:
+        return redirect('/error')
+
+    category_dict = get_category_names(games)
+    game = games[0]
+
+    # videos are optional; render without them if they miss the page deadline
+    videos = fix_video_embed_link(result_by(videos_future, deadline, default=[]))
+    similar_games = result_by(similar_future, deadline, default=[])
 
     if g.user:
         if form.validate_on_submit():
@@ -238,56 +482,57 @@ def show_game_page(game_id):
                             text = form.text.data,
                             game_id=game_id,
                             user_username = g.user.username)
-            g.user.game_reviews.append(review)
+            db.session.add(review)
+            db.session.flush()
+            record_review_added(review)
             db.session.commit()
             return redirect(f'/games/game/{game_id}#reviews')
 
-    return render_template('game_page.html', game=game, category_dict=category_dict, form=form, videos=videos, game_ids_list=game_ids_list, reviews=reviews)
+    stat = get_game_stats([game_id]).get(game_id)
+
+    return render_template('game_page.html', game=game, category_dict=category_dict, form=form, videos=videos, liked_ids=liked_ids, reviews=reviews, review_cursors=review_cursors, stat=stat, similar_games=similar_games)
 
 
 @app.route('/users/profile/<username>')
 def show_user_page(username):
-    """Show a user's profile page"""
+    """Show a user's profile page; liked games are shown a page at a time"""
     user = User.query.get_or_404(username)
 
-    liked_list = get_likes(user)
+    liked_list = get_liked_list(user.username)
 
-    game_ids = ','.join([str(id) for id in liked_list])
+    page_count = max(ceil(len(liked_list) / LIKED_PAGE_SIZE), 1)
+    page = min(max(request.args.get('page', 1, type=int), 1), page_count)
 
-    if game_ids:
-        resp = main_request(base_url, f'/search/?ids={game_ids}&client_id={client_id}')
-        games = resp[0]
-    else:
-        games = {}
+    # only resolve the games that are visible on this page
+    start = LIKED_PAGE_SIZE * (page - 1)
+    games = get_games_by_ids(liked_list[start:start + LIKED_PAGE_SIZE])
 
-    game_ids_list = get_likes(g.user)
+    liked_ids = get_likes(g.user)
 
     reviews = get_latest_reviews_by_user(username)
 
-    return render_template('show_user.html', user=user, games=games, game_ids_list=game_ids_list, reviews=reviews)
+    recommended = []
+    if g.user and g.user.username == user.username:
+        recommended = get_recommended_games(user.username)
+
+    return render_template('show_user.html', user=user, games=games, liked_ids=liked_ids, reviews=reviews, page=page, page_count=page_count, recommended=recommended)
 
 
 @app.route('/users/<username>/reviews')
 def show_user_reviews(username):
     """Show all reviews left by a single user"""
     user = User.query.get_or_404(username)
-    reviews = get_reviews_by_user(user.username)
+    reviews, review_cursors = get_reviews_by_user(user.username, request.args.get('cursor'))
 
     game_ids_list = []
     for review in reviews:
         game_ids_list.append(review.game_id)
-    
-    game_ids = ','.join([str(id) for id in game_ids_list])
-    resp = main_request(base_url, f'/search/?ids={game_ids}&client_id={client_id}')
-    games = resp[0]
 
-    game_names = []
-    for game in games:
-        game_names.append(game['name'])
+    games = get_games_by_ids(game_ids_list)
 
-    game_dict = {game_ids_list[i]: game_names[i] for i in range(len(game_ids_list))}
+    game_dict = {game['id']: game['name'] for game in games}
 
-    return render_template('all_reviews.html', reviews=reviews, game_dict=game_dict, user=user)
+    return render_template('all_reviews.html', reviews=reviews, game_dict=game_dict, user=user, review_cursors=review_cursors)
 
 
 ############################################################################################
@@ -296,10 +541,11 @@ def show_user_reviews(username):
 
 @app.before_request
 def add_user_to_g():
-    """If the user is logged in, add them to g"""
+    """If the user is logged in, add a lightweight identity for them to g;
+    the full User row is only loaded by routes that use g.user.row"""
 
     if CURR_USER in session:
-        g.user = User.query.get(session[CURR_USER])
+        g.user = get_current_user(session[CURR_USER])
     else:
         g.user = None
 
@@ -384,13 +630,16 @@ def edit_user_profile():
     form = EditUserForm(obj=user)
 
     if form.validate_on_submit():
+        old_username = user.username
         user.username = form.username.data
 
         db.session.add(user)
         db.session.commit()
+        invalidate_likes(old_username)
+        invalidate_current_user(old_username)
 
         session[CURR_USER] = user.username
-        g.user = User.query.get(session[CURR_USER])
+        g.user = get_current_user(session[CURR_USER])
 
         flash(f'Successfully updated username to {user.username}!', 'success')
         return redirect(f'/users/profile/{g.user.username}')
@@ -412,9 +661,16 @@ def edit_user_profile():
 def delete_user_account():
     """Delete user account"""
 
-    db.session.delete(g.user)
+    username = g.user.username
+    reviewed_game_ids = record_user_deleted(username)
+    db.session.delete(g.user.row)
+    db.session.flush()
+    for game_id in reviewed_game_ids:
+        refresh_latest_review(game_id)
     del session[CURR_USER]
     db.session.commit()
+    invalidate_likes(username)
+    invalidate_current_user(username)
 
     flash(f"Account deleted. We're sad to see you go!", 'danger')
     return redirect('/')
@@ -456,6 +712,8 @@ def delete_review(review_id):
         return redirect(f'/users/profile/{g.user.username}')
 
     db.session.delete(review)
+    db.session.flush()
+    record_review_deleted(review)
     db.session.commit()
     flash('Review deleted!', 'success')
     return redirect('/')
@@ -465,15 +723,11 @@ def delete_review(review_id):
 @authorized
 def like_game(game_id):
     """Logged in user may like or unlike a game"""
-    
-    resp = main_request(base_url, f'/search/?ids={game_id}&client_id={client_id}')
-    games = resp[0]
-    game_id = games[0]['id']
-
-    game_ids_list = get_likes(g.user)
-
-    add_or_remove_like(game_id, game_ids_list, g.user)
+    if not valid_game_id(game_id):
+        abort(404)
 
+    toggle_like(g.user.username, game_id)
     db.session.commit()
+    invalidate_likes(g.user.username)
 
-    return redirect(request.referrer)
\ No newline at end of file
+    return redirect(request.referrer or f'/games/game/{game_id}')
\ No newline at end of file
@@ -0,0 +1,18 @@
+import os
+from hashlib import sha256
+
+# Fingerprinted static URLs never change content, so browsers may keep them for a year
+STATIC_MAX_AGE = 60 * 60 * 24 * 365
+
+
+def hash_static_files(folder):
+    """Returns a dict of path (relative to folder, with forward slashes) -> short content hash
+    for every file under a static folder"""
+    hashes = {}
+    for root, dirs, files in os.walk(folder):
+        for name in files:
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                digest = sha256(f.read()).hexdigest()[:12]
+            hashes[os.path.relpath(path, folder).replace(os.sep, '/')] = digest
+    return hashes
@@ -0,0 +1,188 @@
+import os
+import time
+from collections import OrderedDict
+from threading import Lock, Event
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+# Default lifetime of a cached API response, in seconds
+DEFAULT_TTL = int(os.environ.get('BGA_CACHE_TTL', 60 * 60))
+
+# Per-endpoint lifetimes; the first path prefix that matches wins.
+# Rankings and game metadata change roughly once a day upstream.
+ENDPOINT_TTLS = [
+    ('/search', 60 * 60 * 6),
+    ('/game/videos', 60 * 60 * 24),
+    ('/game/images', 60 * 60 * 24),
+    ('/game/categories', 60 * 60 * 24),
+]
+
+MAX_ENTRIES = int(os.environ.get('BGA_CACHE_MAX_ENTRIES', 1000))
+
+# Individual games keyed by id, filled from every /search response
+GAME_CACHE_MAX_ENTRIES = int(os.environ.get('GAME_CACHE_MAX_ENTRIES', 5000))
+GAME_CACHE_TTL = 60 * 60 * 6
+
+# Each user's liked game ids; writes in this worker invalidate immediately,
+# the TTL bounds how stale other workers can be
+LIKES_CACHE_MAX_ENTRIES = int(os.environ.get('LIKES_CACHE_MAX_ENTRIES', 5000))
+LIKES_CACHE_TTL = 60
+
+# Logged in identities keyed by username, so each request does not have to select the user row
+USER_CACHE_MAX_ENTRIES = int(os.environ.get('USER_CACHE_MAX_ENTRIES', 5000))
+USER_CACHE_TTL = 30
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a time to live.
+    With max_bytes set, entries are also evicted to keep the sum of sizeof(value) under budget.
+    Keeps hit, miss and eviction counters for monitoring."""
+
+    def __init__(self, max_entries=MAX_ENTRIES, default_ttl=DEFAULT_TTL, max_bytes=None, sizeof=len):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _pop(self, key):
+        expires, value, size = self._data.pop(key)
+        self.bytes -= size
+
+    def get(self, key, default=None):
+        """Return the live value for key and mark it most recently used;
+        expired or missing keys count as a miss and return default"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires, value, size = entry
+                if expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._pop(key)
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        """Store value under key, evicting least recently used entries past max_entries or max_bytes"""
+        ttl = self.default_ttl if ttl is None else ttl
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (time.monotonic() + ttl, value, size)
+            self.bytes += size
+            while self._data and (len(self._data) > self.max_entries
+                                  or (self.max_bytes is not None and self.bytes > self.max_bytes)):
+                self._pop(next(iter(self._data)))
+                self.evictions += 1
+
+    def __contains__(self, key):
+        """Check for a live entry without touching the LRU order or the counters"""
+        entry = self._data.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Return the cache counters as a dict"""
+        return {'entries': len(self._data),
+                'bytes': self.bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions}
+
+
+class _Flight:
+    """One in-flight call that other callers can wait on"""
+
+    def __init__(self):
+        self.done = Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into a single call;
+    callers that arrive while the call is in flight wait for and share its result"""
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = Lock()
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """Call fn() once for all concurrent callers of key and return its result;
+        an exception raised by fn is re-raised in every waiting caller"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                flight = self._flights[key] = _Flight()
+                self.calls += 1
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def stats(self):
+        """Return the coalescing counters as a dict"""
+        return {'calls': self.calls, 'coalesced': self.coalesced}
+
+
+def normalize_endpoint(endpoint):
+    """Build a cache key from a BGA endpoint: drop client_id, sort the query parameters
+    and ignore a trailing slash so equivalent requests share one entry"""
+    parts = urlsplit(endpoint)
+    params = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != 'client_id')
+    path = parts.path.rstrip('/') or '/'
+    return f'{path}?{urlencode(params)}' if params else path
+
+
+def ttl_for(endpoint):
+    """Return the time to live for an endpoint based on ENDPOINT_TTLS"""
+    path = urlsplit(endpoint).path
+    for prefix, ttl in ENDPOINT_TTLS:
+        if path.startswith(prefix):
+            return ttl
+    return DEFAULT_TTL
+
+
+response_cache = TTLCache()
+game_cache = TTLCache(max_entries=GAME_CACHE_MAX_ENTRIES, default_ttl=GAME_CACHE_TTL)
+likes_cache = TTLCache(max_entries=LIKES_CACHE_MAX_ENTRIES, default_ttl=LIKES_CACHE_TTL)
+user_cache = TTLCache(max_entries=USER_CACHE_MAX_ENTRIES, default_ttl=USER_CACHE_TTL)
+upstream_flights = SingleFlight()
@@ -0,0 +1,225 @@
+import time
+from datetime import datetime
+from types import MappingProxyType
+
+from sqlalchemy.dialects.postgresql import insert
+
+from sqlalchemy import case, func, or_, select, tuple_, update
+
+from models import db, Category, CatalogSync, Game, game_categories
+from upstream import bga_get, client_id
+from cursors import keyset_page
+
+# BGA returns at most 100 games per /search call
+SYNC_PAGE_SIZE = 100
+
+# Seconds between checks of whether the games table changed
+CATALOG_VERSION_TTL = 60
+
+_catalog_version = None
+_catalog_version_checked = 0
+_catalog_coverage = None
+
+# Read-only views of the categories table, loaded once per worker
+_category_names = None
+_category_ids = None
+
+
+def refresh_category_map():
+    """Load the categories table into immutable id -> name and name -> id maps"""
+    global _category_names, _category_ids
+
+    rows = db.session.query(Category.id, Category.name).all()
+    _category_names = MappingProxyType({id: name for id, name in rows})
+    _category_ids = MappingProxyType({name: id for id, name in rows})
+
+
+def invalidate_category_map():
+    """Drop the cached maps; they are reloaded on next use"""
+    global _category_names, _category_ids
+
+    _category_names = None
+    _category_ids = None
+
+
+def get_category_map():
+    """Returns the read-only mapping of category id to category name"""
+    if _category_names is None:
+        refresh_category_map()
+    return _category_names
+
+
+def get_category_id(name):
+    """Returns the category id for a category name, or None if there is no such category"""
+    if _category_ids is None:
+        refresh_category_map()
+    return _category_ids.get(name)
+
+
+def game_row(game, rank):
+    """Receives a game from the API JSON and its fallback rank;
+    returns a dict of column values for the games table"""
+    publisher = game.get('primary_publisher') or {}
+    return {
+        'id': game['id'],
+        'name': game.get('name') or '',
+        'rank': game.get('rank') or rank,
+        'price': game.get('price'),
+        'image_url': game.get('image_url'),
+        'thumb_url': game.get('thumb_url'),
+        'min_players': game.get('min_players'),
+        'max_players': game.get('max_players'),
+        'min_age': game.get('min_age'),
+        'min_playtime': game.get('min_playtime'),
+        'max_playtime': game.get('max_playtime'),
+        'year_published': game.get('year_published'),
+        'description_preview': game.get('description_preview'),
+        'primary_publisher': publisher.get('name'),
+        'updated_at': datetime.utcnow(),
+    }
+
+
+def upsert_games(games, first_rank, synced_at=None):
+    """Insert or update a page of API games and their category links, marking them seen by the sync
+    that started at synced_at; games whose values and categories are unchanged keep their updated_at,
+    so the prefix index and card cache only rebuild what really changed"""
+    if not games:
+        return
+
+    synced_at = synced_at or datetime.utcnow()
+    rows = [dict(game_row(game, first_rank + i), synced_at=synced_at) for i, game in enumerate(games)]
+    columns = [column for column in rows[0] if column not in ('id', 'updated_at', 'synced_at')]
+
+    stmt = insert(Game.__table__).values(rows)
+    changed = tuple_(*(Game.__table__.c[column] for column in columns)).is_distinct_from(
+        tuple_(*(stmt.excluded[column] for column in columns)))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Game.id],
+        set_=dict({column: stmt.excluded[column] for column in columns},
+                  updated_at=case((changed, stmt.excluded.updated_at), else_=Game.__table__.c.updated_at),
+                  synced_at=stmt.excluded.synced_at))
+    db.session.execute(stmt)
+
+    # only link categories we know about, so the foreign key holds
+    known = get_category_map()
+    ids = [row['id'] for row in rows]
+    links = {(game['id'], category['id'])
+             for game in games
+             for category in (game.get('categories') or [])
+             if category['id'] in known}
+    current = set(db.session.execute(
+        select(game_categories.c.game_id, game_categories.c.category_id).where(game_categories.c.game_id.in_(ids))))
+
+    recategorized = {game_id for game_id, category_id in links ^ current}
+    if not recategorized:
+        return
+
+    db.session.execute(update(Game.__table__).where(Game.id.in_(recategorized)).values(updated_at=datetime.utcnow()))
+    db.session.execute(game_categories.delete().where(game_categories.c.game_id.in_(recategorized)))
+    relinks = [{'game_id': game_id, 'category_id': category_id}
+               for game_id, category_id in links if game_id in recategorized]
+    if relinks:
+        db.session.execute(insert(game_categories).values(relinks).on_conflict_do_nothing())
+
+
+def sync_catalog(max_games=5000, page_size=SYNC_PAGE_SIZE):
+    """Pull the ranked catalog from BGA in bulk pages and upsert it into the games table;
+    commits after every page, then drops the games this run did not see, which have left
+    the top max_games and would otherwise keep their old ranks, and records the run in catalog_syncs.
+    Returns the number of games synced"""
+    started_at = datetime.utcnow()
+    synced = 0
+    total = 0
+
+    while synced < max_games:
+        json = bga_get(f'/search/?order_by=rank&limit={page_size}&skip={synced}&client_id={client_id}')
+        games = json.get('games') or []
+        total = json.get('count') or total
+        if not games:
+            break
+
+        upsert_games(games, synced + 1, started_at)
+        db.session.commit()
+
+        synced += len(games)
+        if len(games) < page_size:
+            break
+
+    # an empty answer from BGA says nothing about the catalog, so keep the mirror we have
+    if synced:
+        db.session.execute(Game.__table__.delete().where(
+            or_(Game.synced_at.is_(None), Game.synced_at < started_at)))
+        db.session.add(CatalogSync(started_at=started_at, synced=synced, total=max(total, synced)))
+        db.session.commit()
+
+    return synced
+
+
+def catalog_version():
+    """Returns a value that changes whenever the mirrored catalog changes: (game count, last update);
+    the database is asked at most once every CATALOG_VERSION_TTL seconds per worker"""
+    global _catalog_version, _catalog_version_checked, _catalog_coverage
+
+    now = time.monotonic()
+    if _catalog_version is None or now - _catalog_version_checked > CATALOG_VERSION_TTL:
+        count, updated = db.session.query(func.count(Game.id), func.max(Game.updated_at)).one()
+        _catalog_version = (count, updated.isoformat() if updated else None)
+        last_sync = CatalogSync.query.order_by(CatalogSync.id.desc()).first()
+        _catalog_coverage = (last_sync.synced, last_sync.total) if last_sync else None
+        _catalog_version_checked = now
+    return _catalog_version
+
+
+def catalog_coverage():
+    """Returns (synced, total) from the latest sync: the mirror holds the top `synced` of the `total` games
+    BGA ranks. Returns None if the catalog was never synced. Cached along with catalog_version"""
+    catalog_version()
+    return _catalog_coverage
+
+
+def search_catalog(num, limit, category_id=None, min_players=None, max_players=None, cursor=None):
+    """Read one page of ranked games from the local mirror;
+    filters mirror the BGA categories/min_players/max_players search parameters.
+    Pages are keyed on (rank, id): a cursor token from a previous page seeks straight to
+    the next or previous page, and without one the page number is used as an offset.
+    The mirror only holds the top ranked games, so unless the last sync mirrored the whole catalog,
+    only pages of the unfiltered ranking that lie wholly inside the mirror are answered here.
+    Returns [games, count, cursors] like main_request plus the next/prev tokens,
+    or [] if the API has to answer the query instead"""
+    coverage = catalog_coverage()
+    if coverage is None:
+        return []
+    synced, total = coverage
+    complete = synced >= total
+
+    # a category or player filter matches games ranked below the mirror too, and only BGA knows how many
+    if not complete and (category_id or min_players is not None or max_players is not None):
+        return []
+
+    q = Game.query
+
+    if category_id:
+        q = q.join(game_categories, game_categories.c.game_id == Game.id).filter(game_categories.c.category_id == category_id)
+    if min_players is not None:
+        q = q.filter(Game.min_players == min_players)
+    if max_players is not None:
+        q = q.filter(Game.max_players == max_players)
+
+    count = q.count()
+    if not count:
+        return []
+    # pages running past the mirrored rows come from the API
+    if not complete and limit * max(num, 1) > count:
+        return []
+
+    games, cursors = keyset_page(q, [Game.rank, Game.id], cursor, limit, offset=limit * (max(num, 1) - 1))
+
+    return [[game.to_dict() for game in games], count if complete else total, cursors]
+
+
+def get_mirrored_games(game_ids):
+    """Returns a dict of game id to API-shaped game for the ids found in the local mirror"""
+    if not game_ids:
+        return {}
+    games = Game.query.filter(Game.id.in_(game_ids)).all()
+    return {game.id: game.to_dict() for game in games}
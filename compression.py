@@ -0,0 +1,67 @@
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it responses are gzipped
+    brotli = None
+
+# Responses smaller than this are sent as is; compressing them saves less than the headers cost
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_TYPES = {'text/html', 'text/css', 'text/plain', 'application/javascript',
+                      'text/javascript', 'application/json', 'image/svg+xml'}
+
+# Most preferred first
+ENCODINGS = ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def choose_encoding(accept_encodings):
+    """Receives the request's Accept-Encoding header (request.accept_encodings);
+    returns the best encoding both sides support, or None to send the body as is"""
+    for encoding in ENCODINGS:
+        if accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+def compress(body, encoding):
+    """Returns body compressed with the given encoding ('br' or 'gzip')"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def encoded_etag(etag, encoding):
+    """Returns the ETag for one encoding of a representation; each encoding is a different
+    byte sequence, so it needs its own strong ETag"""
+    return f'{etag}-{encoding}' if encoding else etag
+
+
+def is_compressible(response):
+    """True for a complete 200 response of a text type that is not encoded yet"""
+    return (response.status_code == 200
+            and not response.direct_passthrough
+            and response.mimetype in COMPRESSIBLE_TYPES
+            and 'Content-Encoding' not in response.headers)
+
+
+def compress_response(response, accept_encodings):
+    """Compress a response in place when the client accepts it and it is large enough to be worth it"""
+    if not is_compressible(response):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    encoding = choose_encoding(accept_encodings)
+    if encoding is None or len(body) < COMPRESS_MIN_BYTES:
+        return response
+
+    response.set_data(compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(encoded_etag(etag, encoding), weak)
+    return response
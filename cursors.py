@@ -0,0 +1,90 @@
+import json
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from datetime import datetime
+
+from sqlalchemy import tuple_, DateTime
+
+
+def encode_cursor(values, direction):
+    """Encode the sort key of a row and a direction ('next' or 'prev') as an opaque URL-safe token"""
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps({'k': values, 'd': direction}, separators=(',', ':')).encode()
+    return urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, columns):
+    """Decode a token made by encode_cursor for the given sort columns;
+    returns (values, direction), or None if the token is missing, malformed
+    or holds a value of the wrong type for its column"""
+    if not token:
+        return None
+    try:
+        data = json.loads(urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        values = data['k']
+        direction = data['d']
+        if len(values) != len(columns) or direction not in ('next', 'prev'):
+            return None
+        values = [_decode_value(value, column) for value, column in zip(values, columns)]
+    except (ValueError, TypeError, KeyError):
+        return None
+    return values, direction
+
+
+def _decode_value(value, column):
+    """Convert one decoded JSON value back to its column's Python type;
+    raises ValueError if it is not a value that column could hold"""
+    if isinstance(column.type, DateTime):
+        if not isinstance(value, str):
+            raise ValueError(value)
+        return datetime.fromisoformat(value)
+
+    python_type = column.type.python_type
+    if isinstance(value, bool):
+        raise ValueError(value)
+    if python_type is float and isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, python_type):
+        raise ValueError(value)
+    return value
+
+
+def keyset_page(query, columns, token, limit, descending=False, offset=0):
+    """Receives a query, the unique sort columns, a cursor token and a page size;
+    returns (rows, cursors) for the page after or before the cursor, where cursors is
+    a dict of 'next' and 'prev' tokens (None at either end).
+    Without a token the page starts at offset, so plain page numbers still work."""
+    cursor = decode_cursor(token, columns)
+    backwards = cursor is not None and cursor[1] == 'prev'
+
+    if cursor is not None:
+        key = tuple_(*columns)
+        values = tuple_(*cursor[0])
+        # walking forwards in ascending order means keys greater than the cursor
+        if descending == backwards:
+            query = query.filter(key > values)
+        else:
+            query = query.filter(key < values)
+        offset = 0
+
+    if descending == backwards:
+        query = query.order_by(*[column.asc() for column in columns])
+    else:
+        query = query.order_by(*[column.desc() for column in columns])
+
+    rows = query.offset(offset).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+
+    def key_of(row):
+        return [getattr(row, column.key) for column in columns]
+
+    cursors = {'next': None, 'prev': None}
+    if rows:
+        if (has_more and not backwards) or backwards:
+            cursors['next'] = encode_cursor(key_of(rows[-1]), 'next')
+        if (has_more and backwards) or (not backwards and (cursor is not None or offset)):
+            cursors['prev'] = encode_cursor(key_of(rows[0]), 'prev')
+
+    return rows, cursors
@@ -0,0 +1,95 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from threading import current_thread, BoundedSemaphore
+
+from flask import current_app, has_app_context
+
+# Threads shared by all requests in a worker for fetching page data concurrently
+FANOUT_WORKERS = int(os.environ.get('FANOUT_WORKERS', 8))
+
+executor = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix='fanout')
+
+# Low-priority background work (such as prefetching the next page) gets its own small pool
+# and a cap on queued tasks, so it can never hold up foreground requests
+PREFETCH_WORKERS = int(os.environ.get('PREFETCH_WORKERS', 2))
+PREFETCH_QUEUE_DEPTH = int(os.environ.get('PREFETCH_QUEUE_DEPTH', 8))
+
+prefetch_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix='prefetch')
+_prefetch_slots = BoundedSemaphore(PREFETCH_QUEUE_DEPTH)
+
+# for prefetches scheduled outside an app context, which have no current_app.logger
+logger = logging.getLogger(__name__)
+
+
+def submit(fn, *args, **kwargs):
+    """Run fn(*args, **kwargs) on the fan-out pool inside the current app context;
+    returns a Future. Database work in the thread gets its own scoped session."""
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            return fn(*args, **kwargs)
+
+    return executor.submit(run)
+
+
+def prefetch(fn, *args, **kwargs):
+    """Schedule fn(*args, **kwargs) on the background prefetch pool, logging any exception it raises;
+    returns False without scheduling anything if the prefetch queue is full"""
+    if not _prefetch_slots.acquire(blocking=False):
+        return False
+
+    app = current_app._get_current_object() if has_app_context() else None
+
+    def call():
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            (current_app.logger if has_app_context() else logger).exception('Prefetch task failed')
+
+    def run():
+        try:
+            if app is None:
+                return call()
+            with app.app_context():
+                return call()
+        finally:
+            _prefetch_slots.release()
+
+    prefetch_executor.submit(run)
+    return True
+
+
+def map_bounded(fn, items, max_parallel):
+    """Apply fn to every item on the fan-out pool, at most max_parallel at a time;
+    returns the results in order. Runs inline for a single item, or when already
+    on a pool thread, so nested fan-out can never exhaust the pool."""
+    items = list(items)
+    if len(items) <= 1 or current_thread().name.startswith('fanout'):
+        return [fn(item) for item in items]
+
+    results = []
+    for i in range(0, len(items), max_parallel):
+        futures = [submit(fn, item) for item in items[i:i + max_parallel]]
+        results.extend(future.result() for future in futures)
+    return results
+
+
+def deadline_after(seconds):
+    """Returns a deadline, in time.monotonic() terms, the given seconds from now"""
+    return time.monotonic() + seconds
+
+
+def result_by(future, deadline, default=None):
+    """Wait for future until the deadline;
+    returns its result, or default if it missed the deadline or raised.
+    A late future keeps running so its result can still warm the caches."""
+    try:
+        return future.result(timeout=max(deadline - time.monotonic(), 0))
+    except TimeoutError:
+        return default
+    except Exception:
+        current_app.logger.exception('Fan-out task failed')
+        return default
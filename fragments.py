@@ -0,0 +1,101 @@
+import os
+import time
+from threading import Lock
+
+from flask import current_app, g
+from markupsafe import Markup
+
+from cache import TTLCache
+from catalog import catalog_version
+
+# Rendered game cards are shared by every visitor; only the like button and the community stats differ
+CARD_CACHE_MAX_BYTES = int(os.environ.get('CARD_CACHE_MAX_BYTES', 8 * 1024 * 1024))
+CARD_CACHE_MAX_ENTRIES = int(os.environ.get('CARD_CACHE_MAX_ENTRIES', 20000))
+CARD_CACHE_TTL = 60 * 60 * 6
+
+LIKE_SLOT = '<!--like-button-->'
+STATS_SLOT = '<!--game-stats-->'
+
+
+def card_size(parts):
+    """Approximate bytes held by a cached card: the length of its UTF-8 text"""
+    return sum(len(part.encode()) for part in parts)
+
+
+card_cache = TTLCache(max_entries=CARD_CACHE_MAX_ENTRIES, default_ttl=CARD_CACHE_TTL,
+                      max_bytes=CARD_CACHE_MAX_BYTES, sizeof=card_size)
+
+
+class RenderTimer:
+    """Running totals of time spent rendering cards from scratch and filling cached ones;
+    a hit saves roughly the mean full render less what filling its slots cost"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.renders = 0
+        self.render_seconds = 0.0
+        self.fills = 0
+        self.fill_seconds = 0.0
+
+    def add(self, rendered, seconds):
+        with self._lock:
+            if rendered:
+                self.renders += 1
+                self.render_seconds += seconds
+            else:
+                self.fills += 1
+                self.fill_seconds += seconds
+
+    def mean_render(self):
+        return self.render_seconds / self.renders if self.renders else 0.0
+
+    def stats(self):
+        """Return the timing totals and the estimated render time saved, in seconds, as a dict"""
+        return {'renders': self.renders,
+                'render_seconds': self.render_seconds,
+                'fills': self.fills,
+                'fill_seconds': self.fill_seconds,
+                'saved_seconds': max(self.fills * self.mean_render() - self.fill_seconds, 0.0)}
+
+
+card_timer = RenderTimer()
+
+
+def render_game_card(game, categories, liked, stat):
+    """Returns the card markup for a game on a listing page; the shared part is rendered once per
+    (game id, catalog version) and cached, then the viewer's like button and the current stats
+    are rendered into its slots"""
+    env = current_app.jinja_env
+    start = time.perf_counter()
+
+    key = (game['id'], catalog_version())
+    parts = card_cache.get(key)
+    rendered = parts is None
+    if rendered:
+        html = env.get_template('game-card.html').render(game=game, categories=categories or [])
+        before, rest = html.split(LIKE_SLOT)
+        middle, after = rest.split(STATS_SLOT)
+        parts = (before, middle, after)
+        card_cache.set(key, parts)
+
+    # anonymous viewers get no like button, and games nobody has liked or reviewed no stats
+    like_button = env.get_template('like-button.html').render(game=game, liked=liked, g=g) if g.user else ''
+    stats = env.get_template('game-stats.html').render(game=game, stat=stat) if stat else ''
+    card = Markup(parts[0] + like_button + parts[1] + stats + parts[2])
+
+    seconds = time.perf_counter() - start
+    card_timer.add(rendered, seconds)
+    timing = g.setdefault('card_timing', {'rendered': 0, 'cached': 0, 'seconds': 0.0, 'saved': 0.0})
+    timing['seconds'] += seconds
+    if rendered:
+        timing['rendered'] += 1
+    else:
+        timing['cached'] += 1
+        timing['saved'] += max(card_timer.mean_render() - seconds, 0.0)
+    return card
+
+
+def server_timing(timing):
+    """Format a request's card timing as a Server-Timing header value, in milliseconds"""
+    return (f'cards;dur={timing["seconds"] * 1000:.2f};desc="{timing["rendered"]} rendered, {timing["cached"]} cached", '
+            f'cards-saved;dur={timing["saved"] * 1000:.2f}')
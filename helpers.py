@@ -1,17 +1,33 @@
 from flask import g, flash, redirect
 from functools import wraps
-import requests
-from models import db, Category, Like, Review
-from sqlalchemy import desc
+from datetime import datetime
+from requests import RequestException
+from models import db, Category, Like, Review, User
+from sqlalchemy import desc, text
+from upstream import bga_get, base_url, client_id
+from cache import response_cache, game_cache, likes_cache, user_cache, upstream_flights, normalize_endpoint, ttl_for
+from fanout import map_bounded, prefetch
+from cursors import keyset_page
+from search_index import search_names
+from stats import record_likes_changed
+from recommend import get_similar_game_ids, get_recommended_game_ids
+from catalog import get_mirrored_games, get_category_map, refresh_category_map
 
-base_url = 'https://api.boardgameatlas.com/api'
-client_id = 'Vk9QEJ2umU'
+# BGA caps a /search response at 100 games; smaller chunks keep the ids= URL short
+IDS_CHUNK_SIZE = 50
+# most chunk requests a single lookup runs at once
+MAX_PARALLEL_CHUNKS = 4
+# reviews shown per page on a game page and a user's review list
+REVIEWS_PAGE_SIZE = 20
+# games fetched per listing call; pages are sliced out of these cached windows
+LISTING_WINDOW = 100
+# BGA game ids are short alphanumeric strings (e.g. 'yqR4PtpO8X'); anything longer is not a game
+MAX_GAME_ID_LENGTH = 32
 
 
 def get_game_categories():
     """Get game category information and save to database table Category"""
-    categories_resp = requests.get(f'{base_url}/game/categories?client_id={client_id}')
-    json = categories_resp.json()
+    json = bga_get(f'/game/categories?client_id={client_id}')
     categories = json['categories']
 
     for category in categories:
@@ -19,18 +35,19 @@ def get_game_categories():
         db.session.add(category)
     
     db.session.commit()
+    refresh_category_map()
 
 
 def get_category_names(games):
     """Accepts games JSON;
     Saves the category ids attributed to the game to a list;
-    Queries the DB to get the names for categories by ID;
+    Looks up the names for categories by ID in the in-memory category map;
     returns a dictionary with the game's name as a key, and a list of category names as the value"""
+    category_map = get_category_map()
     category_dict = {}
     for game in games:
-        catlist = [category['id'] for category in game['categories'] if game['categories']]
-        q = db.session.query(Category.name).filter(Category.id.in_(catlist)).all()
-        category_names = [category[0] for category in q]
+        catlist = [category['id'] for category in game['categories'] or []]
+        category_names = [category_map[id] for id in catlist if id in category_map]
         category_dict[f"{game['name']}"] = category_names
     
     return category_dict
@@ -39,10 +56,20 @@ def get_category_names(games):
 def get_videos_for_game(game_id):
     """Search for most recent 6 videos on a game based on its game ID"""
     endpoint = f'/game/videos?limit=6&game_id={game_id}&client_id={client_id}'
-    resp = requests.get(base_url + endpoint)
-    json = resp.json()
-    videos = json['videos']
-    return videos
+    key = normalize_endpoint(endpoint)
+    videos = response_cache.get(key)
+    if videos is not None:
+        return videos
+
+    def fetch():
+        videos = bga_get(endpoint).get('videos', [])
+        response_cache.set(key, videos, ttl_for(endpoint))
+        return videos
+
+    try:
+        return upstream_flights.do(key, fetch)
+    except RequestException:
+        return []
 
 
 def fix_video_embed_link(videos):
@@ -61,52 +88,261 @@ def fix_video_embed_link(videos):
 def get_images_for_game(game_id):
     """Retrieve alternate images for game based on game_id"""
     endpoint = f'/game/images?limit=10&id={game_id}&client_id={client_id}'
-    resp = main_request(base_url, endpoint)
-    json = resp.json()
-    images = json['images']
+    try:
+        json = bga_get(endpoint)
+    except RequestException:
+        return []
+    images = json.get('images', [])
     return images
 
 
 def main_request(base_url, endpoint):
     """Receives a base url and the endpoint for that url, 
-    returns the parsed JSON response"""
-    resp = requests.get(base_url + endpoint)
-    json = resp.json()
-    games = json.get('games')
-    count = json.get('count')
-    if games and count:
-        return [games, count]
+    returns the parsed JSON response;
+    returns an empty list if the API is unreachable or times out;
+    successful responses are cached per normalized endpoint and
+    identical in-flight requests are coalesced into one call"""
+    key = normalize_endpoint(endpoint)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
+
+    def fetch():
+        json = bga_get(endpoint, base_url)
+        games = json.get('games')
+        count = json.get('count')
+        if games and count:
+            result = [games, count]
+        else:
+            result = []
+        response_cache.set(key, result, ttl_for(endpoint))
+        for game in games or []:
+            game_cache.set(game['id'], game)
+        return result
+
+    # concurrent misses on the same endpoint share one upstream call
+    try:
+        return upstream_flights.do(key, fetch)
+    except RequestException:
+        return []
+
+
+def fetch_games_chunk(game_ids):
+    """Fetch one chunk of games by id from the API; returns [games, count] like main_request"""
+    ids = ','.join(game_ids)
+    return main_request(base_url, f'/search/?ids={ids}&limit={len(game_ids)}&client_id={client_id}')
+
+
+def get_games_by_ids(game_ids):
+    """Receives a list of game ids;
+    returns the games in the same order, served from the game cache, then the local mirror,
+    and from the API for only the ids that are still missing, in concurrent chunks"""
+    found = {}
+    for id in dict.fromkeys(game_ids):
+        game = game_cache.get(id)
+        if game is not None:
+            found[id] = game
+
+    missing = [id for id in dict.fromkeys(game_ids) if id not in found]
+    if missing:
+        mirrored = get_mirrored_games(missing)
+        for id, game in mirrored.items():
+            game_cache.set(id, game)
+        found.update(mirrored)
+
+    missing = [id for id in missing if id not in found]
+    chunks = [missing[i:i + IDS_CHUNK_SIZE] for i in range(0, len(missing), IDS_CHUNK_SIZE)]
+    for resp in map_bounded(fetch_games_chunk, chunks, MAX_PARALLEL_CHUNKS):
+        if resp:
+            for game in resp[0]:
+                found[game['id']] = game
+
+    return [found[id] for id in game_ids if id in found]
+
+
+def listing_window_endpoint(query, window):
+    """Returns the /search endpoint for one window of a listing query"""
+    params = f'{query}&' if query else ''
+    return f'/search/?{params}limit={LISTING_WINDOW}&skip={LISTING_WINDOW * window}&client_id={client_id}'
+
+
+def listing_windows(num, limit):
+    """Returns the first and last window indexes that cover a 1-based page"""
+    start = limit * (num - 1)
+    return start // LISTING_WINDOW, (start + limit - 1) // LISTING_WINDOW
+
+
+def fetch_listing_page(query, num, limit, prefetch_next=True):
+    """Receives a /search query string (without limit, skip or client_id), a 1-based page number and page size;
+    fetches the wide window(s) of LISTING_WINDOW games covering that page from the API (cached by main_request)
+    and returns [games, count] for just the requested page, or [] if the page is empty.
+    Schedules a background fetch of the next page when it is not cached yet."""
+    start = limit * (num - 1)
+    first, last = listing_windows(num, limit)
+
+    games = []
+    count = 0
+    for window in range(first, last + 1):
+        resp = main_request(base_url, listing_window_endpoint(query, window))
+        if not resp:
+            break
+        games.extend(resp[0])
+        count = resp[1]
+
+    offset = start - LISTING_WINDOW * first
+    page = games[offset:offset + limit]
+
+    if page and prefetch_next and start + limit < count:
+        next_first, next_last = listing_windows(num + 1, limit)
+        windows = range(next_first, next_last + 1)
+        if not all(normalize_endpoint(listing_window_endpoint(query, window)) in response_cache for window in windows):
+            prefetch(fetch_listing_page, query, num + 1, limit, prefetch_next=False)
+
+    if page:
+        return [page, count]
     else:
         return []
 
+
+def search_games_locally(query, num, limit):
+    """Search the local name index for query;
+    returns [games, count] for the 1-based page like main_request, with no games for a page past the last match,
+    or [] if nothing matched, so only a query the local index knows nothing about falls back to the API"""
+    ids = search_names(query)
+    if not ids:
+        return []
+    start = limit * (max(num, 1) - 1)
+    page = ids[start:start + limit]
+    return [get_games_by_ids(page) if page else [], len(ids)]
+
+
+def load_likes(username):
+    """Returns (ordered tuple, frozenset) of the game ids a user liked, oldest like first;
+    cached per user and read as bare ids, never as Like objects"""
+    likes = likes_cache.get(username)
+    if likes is None:
+        ids = tuple(game_id for (game_id,) in
+                    db.session.query(Like.game_id).filter_by(user_username=username).order_by(Like.id))
+        likes = (ids, frozenset(ids))
+        likes_cache.set(username, likes)
+    return likes
+
+
 def get_likes(user):
-    """Retrieve liked game ids for a user"""
+    """Retrieve liked game ids for a user as a frozenset, for fast membership checks"""
     if user:
-        likes = user.liked_games
-        return [game.game_id for game in likes]
+        return load_likes(user.username)[1]
     else:
-        return []
+        return frozenset()
 
 
-def add_or_remove_like(game_id, game_ids_list, user):
-    """Function for adding or removing a liked game from db"""
-    if game_id in game_ids_list:
-        Like.query.filter_by(game_id=game_id, user_username=user.username).delete()
-    else:
-        liked_game = Like(user_username=g.user.username, game_id=game_id)
-        db.session.add(liked_game)
+def get_liked_list(username):
+    """Retrieve liked game ids for a user in the order they were liked"""
+    return list(load_likes(username)[0])
 
 
-def get_reviews_by_game(game_id):
-    """Returns all reviews made for a game by game ID"""
-    reviews = Review.query.filter_by(game_id=game_id).all()
-    return reviews
+def get_similar_games(game_id, k=6):
+    """Returns up to k games often liked together with a game, from the precomputed neighbours"""
+    return get_games_by_ids(get_similar_game_ids(game_id, k))
 
 
-def get_reviews_by_user(username):
-    """Returns all reviews made by a user"""
-    reviews = Review.query.filter_by(user_username=username).all()
-    return reviews
+def get_recommended_games(username, k=6):
+    """Returns up to k games a user has not liked yet, recommended from the neighbours of their recent likes"""
+    return get_games_by_ids(get_recommended_game_ids(get_liked_list(username), k))
+
+
+def invalidate_likes(username):
+    """Forget the cached likes for a user; call after committing a like change"""
+    likes_cache.delete(username)
+
+
+TOGGLE_LIKE_SQL = text("""
+    WITH removed AS (
+        DELETE FROM likes
+        WHERE user_username = :username AND game_id = :game_id
+        RETURNING id, timestamp
+    ), added AS (
+        INSERT INTO likes (user_username, game_id, timestamp)
+        SELECT :username, :game_id, :now
+        WHERE NOT EXISTS (SELECT 1 FROM removed)
+        ON CONFLICT (user_username, game_id) DO NOTHING
+        RETURNING id, timestamp
+    )
+    SELECT (SELECT timestamp FROM added) AS added_at, (SELECT timestamp FROM removed) AS removed_at,
+           EXISTS (SELECT 1 FROM added) AS added, EXISTS (SELECT 1 FROM removed) AS removed
+""")
+
+
+def valid_game_id(game_id):
+    """True if game_id looks like a BGA game id: an alphanumeric string of up to MAX_GAME_ID_LENGTH characters"""
+    return isinstance(game_id, str) and game_id.isalnum() and game_id.isascii() and len(game_id) <= MAX_GAME_ID_LENGTH
+
+
+def toggle_like(username, game_id):
+    """Like the game if the user has not liked it yet, otherwise unlike it,
+    in one atomic statement, and update the game's stats;
+    returns True if the game is now liked"""
+    added_at, removed_at, added, removed = db.session.execute(
+        TOGGLE_LIKE_SQL, {'username': username, 'game_id': game_id, 'now': datetime.utcnow()}).one()
+    record_likes_changed([(game_id, added_at)] if added else [],
+                         [(game_id, removed_at)] if removed else [])
+    # neither flag is set when a concurrent toggle inserted the like first; it is liked either way
+    return not removed
+
+
+BULK_UNLIKE_SQL = text("""
+    DELETE FROM likes
+    WHERE user_username = :username AND game_id = ANY(:game_ids)
+    RETURNING game_id, timestamp
+""")
+
+BULK_LIKE_SQL = text("""
+    INSERT INTO likes (user_username, game_id, timestamp)
+    SELECT :username, unnest(:game_ids), :now
+    ON CONFLICT (user_username, game_id) DO NOTHING
+    RETURNING game_id, timestamp
+""")
+
+
+def apply_like_operations(username, operations):
+    """Receives a username and a list of {'op': 'add' or 'remove', 'game_id': ...} operations;
+    applies them with one set-based DELETE and one INSERT (the last operation on a game wins)
+    and returns the user's liked game ids. The caller commits.
+    Raises ValueError if any game id is not a valid_game_id."""
+    final = {}
+    for operation in operations:
+        if not valid_game_id(operation['game_id']):
+            raise ValueError(f"Invalid game id {operation['game_id']!r}")
+        final[operation['game_id']] = operation['op']
+
+    adds = [game_id for game_id, op in final.items() if op == 'add']
+    removes = [game_id for game_id, op in final.items() if op == 'remove']
+
+    # only rows that really changed move the game stats
+    added = []
+    removed = []
+    if removes:
+        removed = db.session.execute(BULK_UNLIKE_SQL, {'username': username, 'game_ids': removes}).all()
+    if adds:
+        added = db.session.execute(BULK_LIKE_SQL, {'username': username, 'game_ids': adds, 'now': datetime.utcnow()}).all()
+    record_likes_changed(added, removed)
+
+    rows = db.session.execute(text('SELECT game_id FROM likes WHERE user_username = :username'), {'username': username})
+    return [game_id for (game_id,) in rows]
+
+
+def get_reviews_by_game(game_id, cursor=None, limit=REVIEWS_PAGE_SIZE):
+    """Returns a page of reviews made for a game by game ID, newest first,
+    and the next/prev cursor tokens for paging"""
+    q = Review.query.filter_by(game_id=game_id)
+    return keyset_page(q, [Review.timestamp, Review.id], cursor, limit, descending=True)
+
+
+def get_reviews_by_user(username, cursor=None, limit=REVIEWS_PAGE_SIZE):
+    """Returns a page of reviews made by a user, newest first,
+    and the next/prev cursor tokens for paging"""
+    q = Review.query.filter_by(user_username=username)
+    return keyset_page(q, [Review.timestamp, Review.id], cursor, limit, descending=True)
 
 
 def get_latest_reviews_by_user(username):
@@ -114,6 +350,41 @@ def get_latest_reviews_by_user(username):
     reviews = Review.query.filter_by(user_username=username).order_by(desc(Review.timestamp)).limit(10).all()
     return reviews
 
+class CurrentUser:
+    """Lightweight identity of the logged in user, stored on g.user;
+    carries what templates need and loads the full User row only when asked"""
+
+    def __init__(self, username, email):
+        self.username = username
+        self.email = email
+        self._row = None
+
+    @property
+    def row(self):
+        """The full User row for this identity, loaded on first use"""
+        if self._row is None:
+            self._row = User.query.get(self.username)
+        return self._row
+
+
+def get_current_user(username):
+    """Returns a CurrentUser for username, or None if no such user exists;
+    identities are cached per worker for a short time, and the password hash is never read"""
+    identity = user_cache.get(username)
+    if identity is None:
+        row = db.session.query(User.username, User.email).filter_by(username=username).first()
+        if row is None:
+            return None
+        identity = (row.username, row.email)
+        user_cache.set(username, identity)
+    return CurrentUser(*identity)
+
+
+def invalidate_current_user(username):
+    """Forget the cached identity for a user; call after the account changes or is deleted"""
+    user_cache.delete(username)
+
+
 def authorized(f):
     """Decorator function for checking user authorization"""
     @wraps(f)
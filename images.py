@@ -0,0 +1,140 @@
+import os
+import tempfile
+from io import BytesIO
+from threading import Lock
+
+from PIL import Image
+from requests import RequestException
+
+from cache import SingleFlight
+from upstream import fetch_bytes
+
+# Fixed sizes the image proxy serves, as the box each image is shrunk to fit (width, height).
+# Thumbnails are 8rem and cards 15rem tall; the sizes allow for 2x screens.
+IMAGE_SIZES = {
+    'thumb': (256, 256),
+    'card': (640, 480),
+    'hero': (960, 960),
+}
+JPEG_QUALITY = 82
+
+IMAGE_CACHE_DIR = os.environ.get('IMAGE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'boardgame-images'))
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get('IMAGE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+# eviction trims the cache to this fraction of the cap, so it does not run on every write
+IMAGE_CACHE_LOW_WATER = 0.9
+# largest upstream image we are willing to download
+MAX_SOURCE_BYTES = 20 * 1024 * 1024
+
+# what caching an upstream image can raise: a failed download, an unreadable image, or one whose
+# pixel count trips Pillow's decompression bomb check (which is not an OSError)
+IMAGE_ERRORS = (RequestException, OSError, Image.DecompressionBombError)
+
+image_flights = SingleFlight()
+
+_cache_bytes = None
+_cache_lock = Lock()
+
+
+def image_path(game_id, size):
+    """Returns the on-disk cache path for a game's image at one of IMAGE_SIZES"""
+    return os.path.join(IMAGE_CACHE_DIR, f'{game_id}-{size}.jpg')
+
+
+def resize(source, box):
+    """Receives image bytes and a (width, height) box; returns JPEG bytes of the image shrunk
+    to fit the box, keeping its aspect ratio, with any transparency flattened onto white"""
+    with Image.open(BytesIO(source)) as image:
+        image.draft('RGB', box)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        else:
+            image = image.convert('RGB')
+        image.thumbnail(box, Image.LANCZOS)
+
+        out = BytesIO()
+        image.save(out, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+        return out.getvalue()
+
+
+def _write(path, data):
+    """Write a cache file atomically, so readers in other workers never see half of it"""
+    fd, tmp = tempfile.mkstemp(dir=IMAGE_CACHE_DIR, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _cache_entries():
+    entries = []
+    for entry in os.scandir(IMAGE_CACHE_DIR):
+        if entry.is_file() and entry.name.endswith('.jpg'):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    return entries
+
+
+def evict_images(max_bytes=IMAGE_CACHE_MAX_BYTES):
+    """Delete the least recently used cached images until the cache is under IMAGE_CACHE_LOW_WATER of max_bytes;
+    recency is the file's mtime, which every cache hit refreshes. Returns the bytes now cached."""
+    entries = sorted(_cache_entries())
+    total = sum(size for mtime, size, path in entries)
+    for mtime, size, path in entries:
+        if total <= max_bytes * IMAGE_CACHE_LOW_WATER:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+    return total
+
+
+def _added(nbytes):
+    """Count bytes written to the cache, evicting once the cap is passed; the count is per worker,
+    so it is re-read from disk at startup and after every eviction"""
+    global _cache_bytes
+
+    with _cache_lock:
+        if _cache_bytes is None:
+            _cache_bytes = sum(size for mtime, size, path in _cache_entries())
+        _cache_bytes += nbytes
+        if _cache_bytes > IMAGE_CACHE_MAX_BYTES:
+            _cache_bytes = evict_images()
+
+
+def cache_game_images(game_id, image_url):
+    """Download a game's image once and store it resized to every one of IMAGE_SIZES"""
+    source = fetch_bytes(image_url, MAX_SOURCE_BYTES)
+    written = 0
+    for size, box in IMAGE_SIZES.items():
+        data = resize(source, box)
+        _write(image_path(game_id, size), data)
+        written += len(data)
+    _added(written)
+
+
+def cached_image_file(game_id, size):
+    """Returns the path of a game's cached image at one of IMAGE_SIZES, marking it recently used,
+    or None if it is not cached"""
+    path = image_path(game_id, size)
+    try:
+        os.utime(path)
+        return path
+    except FileNotFoundError:
+        return None
+
+
+def get_image_file(game_id, size, image_url):
+    """Returns the path of a game's cached image at one of IMAGE_SIZES, fetching and resizing image_url
+    on a miss, with concurrent misses for one game sharing a download.
+    Raises one of IMAGE_ERRORS if the upstream image cannot be fetched or read."""
+    path = cached_image_file(game_id, size)
+    if path is not None:
+        return path
+
+    os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+    image_flights.do(game_id, lambda: cache_game_images(game_id, image_url))
+    return image_path(game_id, size)
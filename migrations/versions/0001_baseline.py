@@ -0,0 +1,98 @@
+"""baseline schema: users, categories, likes, reviews and the games mirror
+
+Databases created earlier with db.create_all() already have some or all of these
+tables, so each table is only created when it is missing. That lets an existing
+database run `flask db upgrade` without being stamped first.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-18 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_baseline'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'users' not in existing:
+        op.create_table('users',
+            sa.Column('username', sa.String(length=20), nullable=False),
+            sa.Column('email', sa.String(), nullable=False),
+            sa.Column('password', sa.Text(), nullable=False),
+            sa.PrimaryKeyConstraint('username'),
+            sa.UniqueConstraint('email'),
+            sa.UniqueConstraint('username'))
+
+    if 'categories' not in existing:
+        op.create_table('categories',
+            sa.Column('id', sa.String(), nullable=False),
+            sa.Column('name', sa.String(), nullable=True),
+            sa.PrimaryKeyConstraint('id'))
+
+    if 'likes' not in existing:
+        op.create_table('likes',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('user_username', sa.String(), nullable=True),
+            sa.Column('game_id', sa.String(), nullable=False),
+            sa.ForeignKeyConstraint(['user_username'], ['users.username'], onupdate='CASCADE', ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'))
+
+    if 'reviews' not in existing:
+        op.create_table('reviews',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('title', sa.String(length=75), nullable=False),
+            sa.Column('text', sa.String(length=500), nullable=False),
+            sa.Column('timestamp', sa.DateTime(), nullable=True),
+            sa.Column('game_id', sa.String(), nullable=False),
+            sa.Column('user_username', sa.String(), nullable=False),
+            sa.ForeignKeyConstraint(['user_username'], ['users.username'], onupdate='CASCADE', ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'))
+
+    if 'games' not in existing:
+        op.create_table('games',
+            sa.Column('id', sa.String(), nullable=False),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('rank', sa.Integer(), nullable=False),
+            sa.Column('price', sa.String(), nullable=True),
+            sa.Column('image_url', sa.String(), nullable=True),
+            sa.Column('thumb_url', sa.String(), nullable=True),
+            sa.Column('min_players', sa.Integer(), nullable=True),
+            sa.Column('max_players', sa.Integer(), nullable=True),
+            sa.Column('min_age', sa.Integer(), nullable=True),
+            sa.Column('min_playtime', sa.Integer(), nullable=True),
+            sa.Column('max_playtime', sa.Integer(), nullable=True),
+            sa.Column('year_published', sa.Integer(), nullable=True),
+            sa.Column('description_preview', sa.Text(), nullable=True),
+            sa.Column('primary_publisher', sa.String(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'))
+        op.create_index('ix_games_rank_id', 'games', ['rank', 'id'])
+        op.create_index('ix_games_players_rank', 'games', ['min_players', 'max_players', 'rank', 'id'])
+        op.create_index('ix_games_updated_at', 'games', ['updated_at'])
+
+    if 'game_categories' not in existing:
+        op.create_table('game_categories',
+            sa.Column('game_id', sa.String(), nullable=False),
+            sa.Column('category_id', sa.String(), nullable=False),
+            sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['game_id'], ['games.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('game_id', 'category_id'))
+        op.create_index('ix_game_categories_category_id', 'game_categories', ['category_id'])
+
+
+def downgrade():
+    op.drop_table('game_categories')
+    op.drop_table('games')
+    op.drop_table('reviews')
+    op.drop_table('likes')
+    op.drop_table('categories')
+    op.drop_table('users')
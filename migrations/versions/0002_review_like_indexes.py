@@ -0,0 +1,85 @@
+"""indexes on reviews and likes; unique (user_username, game_id) on likes
+
+The indexes are built with CREATE INDEX CONCURRENTLY outside of a transaction,
+so a live database keeps serving reads and writes while they build.
+Duplicate likes left by double clicks are removed first so the unique index can build;
+if a new duplicate slips in while it builds, the invalid index is dropped and the build retried,
+and an invalid index left by an earlier failed run is rebuilt rather than skipped.
+
+Revision ID: 0002_review_like_indexes
+Revises: 0001_baseline
+Create Date: 2026-10-18 12:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.exc import IntegrityError
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_review_like_indexes'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_reviews_game_id_timestamp', 'reviews', ['game_id', 'timestamp'], False),
+    ('ix_reviews_user_username_timestamp', 'reviews', ['user_username', 'timestamp'], False),
+    ('ix_likes_user_username_game_id', 'likes', ['user_username', 'game_id'], True),
+]
+
+
+DEDUPE_LIKES_SQL = """
+    DELETE FROM likes a
+    USING likes b
+    WHERE a.user_username = b.user_username
+      AND a.game_id = b.game_id
+      AND a.id > b.id
+"""
+
+# A like can be duplicated between the dedupe and the end of the unique index build,
+# since the app keeps running; the build then fails and is retried after another dedupe
+UNIQUE_BUILD_ATTEMPTS = 5
+
+
+def index_is_invalid(bind, name):
+    """True if a failed CREATE INDEX CONCURRENTLY left the index behind marked invalid"""
+    return bool(bind.execute(sa.text('SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)'),
+                             {'name': name}).scalar())
+
+
+def build_index(bind, name, table, columns, unique):
+    """Build an index without blocking writes, replacing an invalid one left by an earlier failed run"""
+    if index_is_invalid(bind, name):
+        op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+    op.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY IF NOT EXISTS "
+               f"{name} ON {table} ({', '.join(columns)})")
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            if not unique:
+                build_index(bind, name, table, columns, unique)
+                continue
+
+            for attempt in range(UNIQUE_BUILD_ATTEMPTS):
+                # keep the oldest of any duplicated likes
+                op.execute(DEDUPE_LIKES_SQL)
+                try:
+                    build_index(bind, name, table, columns, unique)
+                    break
+                except IntegrityError:
+                    # never leave an invalid index behind for IF NOT EXISTS to skip on a re-run
+                    op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+                    if attempt == UNIQUE_BUILD_ATTEMPTS - 1:
+                        raise
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in reversed(INDEXES):
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
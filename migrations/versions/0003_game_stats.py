@@ -0,0 +1,33 @@
+"""game_stats: like and review counts per game
+
+Run `flask rebuild-game-stats` once after upgrading to fill it from existing likes and reviews.
+
+Revision ID: 0003_game_stats
+Revises: 0002_review_like_indexes
+Create Date: 2026-10-18 13:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_game_stats'
+down_revision = '0002_review_like_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('game_stats',
+        sa.Column('game_id', sa.String(), nullable=False),
+        sa.Column('like_count', sa.Integer(), nullable=False),
+        sa.Column('review_count', sa.Integer(), nullable=False),
+        sa.Column('latest_review_id', sa.Integer(), nullable=True),
+        sa.Column('latest_review_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['latest_review_id'], ['reviews.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('game_id'))
+
+
+def downgrade():
+    op.drop_table('game_stats')
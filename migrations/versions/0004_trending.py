@@ -0,0 +1,56 @@
+"""likes.timestamp; trending_score on game_stats; leaderboard indexes
+
+Existing likes keep a NULL timestamp, as their real time is unknown, and add nothing to trending scores;
+only their like counts carry over. The leaderboard indexes are built with CREATE INDEX CONCURRENTLY
+outside of a transaction, as in 0002, so game_stats stays writable while they build.
+Run `flask rebuild-game-stats` afterwards to compute trending scores for existing reviews.
+
+Revision ID: 0004_trending
+Revises: 0003_game_stats
+Create Date: 2026-10-18 14:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_trending'
+down_revision = '0003_game_stats'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_game_stats_trending_score_game_id', ['trending_score', 'game_id']),
+    ('ix_game_stats_like_count_game_id', ['like_count', 'game_id']),
+]
+
+
+def index_is_invalid(bind, name):
+    """True if a failed CREATE INDEX CONCURRENTLY left the index behind marked invalid"""
+    return bool(bind.execute(sa.text('SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)'),
+                             {'name': name}).scalar())
+
+
+def upgrade():
+    op.add_column('likes', sa.Column('timestamp', sa.DateTime(), nullable=True))
+
+    op.add_column('game_stats', sa.Column('trending_score', sa.Float(), nullable=False, server_default='0'))
+    op.alter_column('game_stats', 'trending_score', server_default=None)
+
+    bind = op.get_bind()
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            # replace an invalid index left by an earlier failed run rather than skip it
+            if index_is_invalid(bind, name):
+                op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON game_stats ({', '.join(columns)})")
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, columns in reversed(INDEXES):
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+    op.drop_column('game_stats', 'trending_score')
+    op.drop_column('likes', 'timestamp')
@@ -0,0 +1,39 @@
+"""game_neighbors for recommendations; neighbors_dirty flag on game_stats
+
+Run `flask refresh-recommendations --full` once after upgrading to fill game_neighbors.
+
+Revision ID: 0005_game_neighbors
+Revises: 0004_trending
+Create Date: 2026-10-18 15:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_game_neighbors'
+down_revision = '0004_trending'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('game_neighbors',
+        sa.Column('game_id', sa.String(), nullable=False),
+        sa.Column('neighbor_id', sa.String(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('game_id', 'neighbor_id'))
+    op.create_index('ix_game_neighbors_game_id_score', 'game_neighbors', ['game_id', 'score'])
+
+    op.add_column('game_stats', sa.Column('neighbors_dirty', sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.alter_column('game_stats', 'neighbors_dirty', server_default=None)
+    op.create_index('ix_game_stats_neighbors_dirty', 'game_stats', ['game_id'],
+                    postgresql_where=sa.text('neighbors_dirty'))
+
+
+def downgrade():
+    op.drop_index('ix_game_stats_neighbors_dirty', table_name='game_stats')
+    op.drop_column('game_stats', 'neighbors_dirty')
+    op.drop_index('ix_game_neighbors_game_id_score', table_name='game_neighbors')
+    op.drop_table('game_neighbors')
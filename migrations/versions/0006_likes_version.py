@@ -0,0 +1,25 @@
+"""likes_version on game_stats, so the recommendations refresh keeps flags set by likes made while it runs
+
+Revision ID: 0006_likes_version
+Revises: 0005_game_neighbors
+Create Date: 2026-10-19 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_likes_version'
+down_revision = '0005_game_neighbors'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('game_stats', sa.Column('likes_version', sa.Integer(), nullable=False, server_default='0'))
+    op.alter_column('game_stats', 'likes_version', server_default=None)
+
+
+def downgrade():
+    op.drop_column('game_stats', 'likes_version')
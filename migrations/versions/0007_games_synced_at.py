@@ -0,0 +1,26 @@
+"""games.synced_at, so a sync can drop games that left the ranked catalog
+
+Existing games have no synced_at and are dropped by the next `flask sync-games` unless it sees them again.
+
+Revision ID: 0007_games_synced_at
+Revises: 0006_likes_version
+Create Date: 2026-10-19 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_games_synced_at'
+down_revision = '0006_likes_version'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('games', sa.Column('synced_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('games', 'synced_at')
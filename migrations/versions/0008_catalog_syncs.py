@@ -0,0 +1,32 @@
+"""catalog_syncs, recording how much of the ranked catalog each sync mirrored
+
+Listings fall back to the API until the first `flask sync-games` after upgrading has recorded a run.
+
+Revision ID: 0008_catalog_syncs
+Revises: 0007_games_synced_at
+Create Date: 2026-10-19 12:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_catalog_syncs'
+down_revision = '0007_games_synced_at'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('catalog_syncs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=False),
+        sa.Column('synced', sa.Integer(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'))
+
+
+def downgrade():
+    op.drop_table('catalog_syncs')
@@ -22,6 +22,96 @@ class Category(db.Model):
     name = db.Column(db.String)
 
 
+game_categories = db.Table('game_categories',
+    db.Column('game_id', db.String, db.ForeignKey('games.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('category_id', db.String, db.ForeignKey('categories.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_game_categories_category_id', 'category_id'))
+
+
+class Game(db.Model):
+    """Local mirror of a ranked game from the API, synced with `flask sync-games`"""
+
+    __tablename__ = 'games'
+
+    id = db.Column(db.String, primary_key=True)
+
+    name = db.Column(db.String, nullable=False)
+
+    rank = db.Column(db.Integer, nullable=False)
+
+    price = db.Column(db.String)
+
+    image_url = db.Column(db.String)
+
+    thumb_url = db.Column(db.String)
+
+    min_players = db.Column(db.Integer)
+
+    max_players = db.Column(db.Integer)
+
+    min_age = db.Column(db.Integer)
+
+    min_playtime = db.Column(db.Integer)
+
+    max_playtime = db.Column(db.Integer)
+
+    year_published = db.Column(db.Integer)
+
+    description_preview = db.Column(db.Text)
+
+    primary_publisher = db.Column(db.String)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    # start time of the last `flask sync-games` run that saw the game; games a finished run did not see are dropped
+    synced_at = db.Column(db.DateTime)
+
+    categories = db.relationship('Category', secondary=game_categories, lazy='selectin')
+
+    __table_args__ = (
+        db.Index('ix_games_rank_id', 'rank', 'id'),
+        db.Index('ix_games_players_rank', 'min_players', 'max_players', 'rank', 'id'),
+    )
+
+    def to_dict(self):
+        """Return the game in the same shape as a game from the API's /search endpoint"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'rank': self.rank,
+            'price': self.price,
+            'image_url': self.image_url,
+            'thumb_url': self.thumb_url,
+            'min_players': self.min_players,
+            'max_players': self.max_players,
+            'min_age': self.min_age,
+            'min_playtime': self.min_playtime,
+            'max_playtime': self.max_playtime,
+            'year_published': self.year_published,
+            'description_preview': self.description_preview,
+            'primary_publisher': {'name': self.primary_publisher},
+            'categories': [{'id': category.id} for category in self.categories],
+        }
+
+
+
+class CatalogSync(db.Model):
+    """A finished run of `flask sync-games`; the latest one says how much of the ranked catalog the mirror holds"""
+
+    __tablename__ = 'catalog_syncs'
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    started_at = db.Column(db.DateTime, nullable=False)
+
+    finished_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    # top ranked games mirrored by the run
+    synced = db.Column(db.Integer, nullable=False)
+
+    # games in the ranked catalog as BGA counted them during the run
+    total = db.Column(db.Integer, nullable=False)
+
 
 class Like(db.Model):
     """Mapping user likes to API game IDs"""
@@ -34,6 +124,12 @@ class Like(db.Model):
 
     game_id = db.Column(db.String, nullable=False)
 
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_likes_user_username_game_id', 'user_username', 'game_id', unique=True),
+    )
+
 
 class Review(db.Model):
     """A review of a game"""
@@ -46,12 +142,65 @@ class Review(db.Model):
 
     text = db.Column(db.String(500), nullable=False,)
 
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow())
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
     game_id = db.Column(db.String, nullable=False)
 
     user_username = db.Column(db.String, db.ForeignKey('users.username', ondelete='CASCADE', onupdate='CASCADE'), nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_reviews_game_id_timestamp', 'game_id', 'timestamp'),
+        db.Index('ix_reviews_user_username_timestamp', 'user_username', 'timestamp'),
+    )
+
+
+class GameStat(db.Model):
+    """Like and review counts and a time-decayed trending score per game,
+    kept up to date by the like and review routes; rebuild from scratch with `flask rebuild-game-stats`"""
+
+    __tablename__ = 'game_stats'
+
+    game_id = db.Column(db.String, primary_key=True)
+
+    like_count = db.Column(db.Integer, nullable=False, default=0)
+
+    review_count = db.Column(db.Integer, nullable=False, default=0)
+
+    latest_review_id = db.Column(db.Integer, db.ForeignKey('reviews.id', ondelete='SET NULL'))
+
+    latest_review_at = db.Column(db.DateTime)
+
+    trending_score = db.Column(db.Float, nullable=False, default=0)
+
+    # set when the game's likes change, cleared once `flask refresh-recommendations` has recomputed its neighbours
+    neighbors_dirty = db.Column(db.Boolean, nullable=False, default=False)
+
+    # bumped on every like change, so the refresh only clears flags for games unchanged since it read them
+    likes_version = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_game_stats_trending_score_game_id', 'trending_score', 'game_id'),
+        db.Index('ix_game_stats_like_count_game_id', 'like_count', 'game_id'),
+        db.Index('ix_game_stats_neighbors_dirty', 'game_id', postgresql_where=db.text('neighbors_dirty')),
+    )
+
+
+class GameNeighbor(db.Model):
+    """The games most often liked by the same users as a game, by cosine similarity of their likes;
+    precomputed by `flask refresh-recommendations`"""
+
+    __tablename__ = 'game_neighbors'
+
+    game_id = db.Column(db.String, primary_key=True)
+
+    neighbor_id = db.Column(db.String, primary_key=True)
+
+    score = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_game_neighbors_game_id_score', 'game_id', 'score'),
+    )
+
 
 class User(db.Model):
     """Users in the db"""
@@ -64,7 +213,7 @@ class User(db.Model):
 
     password = db.Column(db.Text, nullable=False)
 
-    liked_games = db.relationship('Like', backref='user')
+    liked_games = db.relationship('Like', backref='user', passive_deletes=True)
 
     game_reviews = db.relationship("Review", cascade='all, delete')
 
@@ -0,0 +1,107 @@
+import os
+import time
+from functools import wraps
+from hashlib import sha256
+
+from flask import g, request, session, make_response
+
+from cache import TTLCache
+from compression import COMPRESSIBLE_TYPES, COMPRESS_MIN_BYTES, ENCODINGS, choose_encoding, compress, encoded_etag
+
+# Whole rendered pages for anonymous visitors; every anonymous visitor sees the same bytes
+PAGE_CACHE_TTL = int(os.environ.get('PAGE_CACHE_TTL', 60))
+PAGE_CACHE_MAX_ENTRIES = int(os.environ.get('PAGE_CACHE_MAX_ENTRIES', 2000))
+PAGE_CACHE_MAX_BYTES = int(os.environ.get('PAGE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+
+class CachedPage:
+    """The parts of a rendered response needed to replay it,
+    with the body compressed once up front in each supported encoding"""
+
+    def __init__(self, body, mimetype):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = sha256(body).hexdigest()[:32]
+        # whole seconds, so it round-trips through an HTTP date
+        self.last_modified = int(time.time())
+        self.variants = {None: body}
+        if mimetype in COMPRESSIBLE_TYPES and len(body) >= COMPRESS_MIN_BYTES:
+            for encoding in ENCODINGS:
+                self.variants[encoding] = compress(body, encoding)
+
+    def size(self):
+        return sum(len(variant) for variant in self.variants.values())
+
+
+page_cache = TTLCache(max_entries=PAGE_CACHE_MAX_ENTRIES, default_ttl=PAGE_CACHE_TTL,
+                      max_bytes=PAGE_CACHE_MAX_BYTES, sizeof=CachedPage.size)
+
+
+# Session keys that say nothing about who the visitor is; Flask-WTF leaves a CSRF token
+# in the session of anyone who has been shown a form, logged in or not
+ANONYMOUS_SESSION_KEYS = {'csrf_token'}
+
+
+def has_visitor_state():
+    """True if the session identifies the visitor or holds something for them, such as the
+    logged in username or flashed messages waiting to be shown"""
+    return not set(session.keys()) <= ANONYMOUS_SESSION_KEYS
+
+
+def is_anonymous_request():
+    """True for a GET or HEAD from a visitor who is not logged in and has no flashed messages"""
+    return request.method in ('GET', 'HEAD') and not g.get('user') and not has_visitor_state()
+
+
+def page_response(page, status):
+    """Build a response for a cached page in the best encoding the client accepts,
+    answering If-None-Match and If-Modified-Since with a 304"""
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding not in page.variants:
+        encoding = None
+
+    response = make_response(page.variants[encoding])
+    response.mimetype = page.mimetype
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.set_etag(encoded_etag(page.etag, encoding))
+    response.last_modified = page.last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = PAGE_CACHE_TTL
+    response.vary.add('Cookie')
+    response.vary.add('Accept-Encoding')
+    response.headers['X-Page-Cache'] = status
+    return response.make_conditional(request)
+
+
+def cache_anonymous_page(view):
+    """Serve a view's pages to anonymous visitors from the page cache, with strong ETags and
+    conditional GET. Only use it on views whose output depends on nothing but the URL and g.user:
+    requests with a logged in g.user, flashed messages or other visitor state in the session bypass
+    the cache and get a private response, and only 200 responses that left the session alone are stored."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not is_anonymous_request():
+            response = make_response(view(*args, **kwargs))
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            response.vary.add('Cookie')
+            return response
+
+        key = request.full_path
+        page = page_cache.get(key)
+        if page is not None:
+            return page_response(page, 'HIT')
+
+        response = make_response(view(*args, **kwargs))
+        # the view may have flashed a message, logged someone in or issued a CSRF token on the way
+        if response.status_code != 200 or session.modified or has_visitor_state():
+            response.vary.add('Cookie')
+            return response
+
+        page = CachedPage(response.get_data(), response.mimetype)
+        page_cache.set(key, page)
+        return page_response(page, 'MISS')
+
+    return wrapper
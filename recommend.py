@@ -0,0 +1,143 @@
+import numpy as np
+from scipy import sparse
+from sqlalchemy import text, func
+
+from models import db, GameNeighbor
+
+# neighbours stored per game
+NEIGHBORS_PER_GAME = 20
+# games whose similarities are computed in one sparse product; bounds the dense block to this many rows
+SIMILARITY_BLOCK = 256
+# a user's most recent likes used to build their recommendations
+RECOMMEND_FROM_LIKES = 50
+# rows per INSERT/DELETE when rewriting game_neighbors
+WRITE_CHUNK = 1000
+
+
+def likes_matrix(likes):
+    """Receives (username, game id) pairs; returns (matrix, game ids) where matrix is a sparse
+    users x games CSR matrix of ones and game ids names its columns"""
+    users = {}
+    games = {}
+    rows = []
+    cols = []
+    for username, game_id in likes:
+        rows.append(users.setdefault(username, len(users)))
+        cols.append(games.setdefault(game_id, len(games)))
+
+    matrix = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(users), len(games)))
+    # a repeated pair would sum to 2; likes are yes or no
+    matrix.data[:] = 1
+    return matrix, list(games)
+
+
+def co_liked(matrix, cols):
+    """Returns the set of columns liked by at least one user who also liked one of cols"""
+    if not cols:
+        return set()
+    users = np.flatnonzero(np.asarray(matrix[:, cols].sum(axis=1)).ravel())
+    return set(np.flatnonzero(np.asarray(matrix[users].sum(axis=0)).ravel()).tolist())
+
+
+def top_neighbors(matrix, cols, k=NEIGHBORS_PER_GAME):
+    """Receives a users x games likes matrix and the columns to compute;
+    returns a dict of column -> up to k (column, cosine similarity) pairs, most similar first"""
+    norms = np.sqrt(np.asarray(matrix.sum(axis=0)).ravel())
+    norms[norms == 0] = 1
+    normalized = (matrix @ sparse.diags(1 / norms)).tocsc()
+
+    neighbors = {}
+    cols = list(cols)
+    for start in range(0, len(cols), SIMILARITY_BLOCK):
+        block = cols[start:start + SIMILARITY_BLOCK]
+        sims = (normalized[:, block].T @ normalized).toarray()
+        sims[np.arange(len(block)), block] = 0
+
+        for row, col in enumerate(block):
+            scores = sims[row]
+            candidates = np.flatnonzero(scores)
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+            ordered = sorted(candidates.tolist(), key=lambda j: (-scores[j], j))
+            neighbors[col] = [(j, float(scores[j])) for j in ordered]
+    return neighbors
+
+
+def dirty_games():
+    """Returns a dict of game id -> likes_version for the games flagged for new neighbours"""
+    rows = db.session.execute(text('SELECT game_id, likes_version FROM game_stats WHERE neighbors_dirty'))
+    return {game_id: version for game_id, version in rows}
+
+
+CLEAR_DIRTY_SQL = text("""
+    UPDATE game_stats SET neighbors_dirty = false
+    WHERE game_id = :game_id AND likes_version = :version
+""")
+
+
+def refresh_neighbors(full=False, k=NEIGHBORS_PER_GAME):
+    """Recompute stored neighbours from the likes table. By default only games whose similarities
+    could have changed are rewritten: games with changed likes, the games co-liked with them,
+    and games that listed them as neighbours. The dirty flags are cleared in the same transaction
+    that writes the new neighbours, and only for games whose likes did not change meanwhile,
+    so a failed run is simply retried by the next one. Returns the number of games rewritten."""
+    versions = dirty_games()
+    if not versions and not full:
+        return 0
+    dirty = set(versions)
+
+    matrix, games = likes_matrix(db.session.execute(
+        text('SELECT user_username, game_id FROM likes WHERE user_username IS NOT NULL')))
+    index = {game_id: col for col, game_id in enumerate(games)}
+
+    if full:
+        affected = set(games) | {game_id for (game_id,) in db.session.query(GameNeighbor.game_id).distinct()}
+    else:
+        dirty_cols = [index[game_id] for game_id in dirty if game_id in index]
+        affected = dirty | {games[col] for col in co_liked(matrix, dirty_cols)}
+        dirty_list = list(dirty)
+        for i in range(0, len(dirty_list), WRITE_CHUNK):
+            affected.update(game_id for (game_id,) in db.session.query(GameNeighbor.game_id).distinct()
+                            .filter(GameNeighbor.neighbor_id.in_(dirty_list[i:i + WRITE_CHUNK])))
+
+    neighbors = top_neighbors(matrix, [index[game_id] for game_id in affected if game_id in index], k)
+    rows = [{'game_id': games[col], 'neighbor_id': games[neighbor], 'score': score}
+            for col, pairs in neighbors.items()
+            for neighbor, score in pairs]
+
+    affected = list(affected)
+    for i in range(0, len(affected), WRITE_CHUNK):
+        GameNeighbor.query.filter(GameNeighbor.game_id.in_(affected[i:i + WRITE_CHUNK])).delete(synchronize_session=False)
+    for i in range(0, len(rows), WRITE_CHUNK):
+        db.session.execute(GameNeighbor.__table__.insert(), rows[i:i + WRITE_CHUNK])
+    if versions:
+        db.session.execute(CLEAR_DIRTY_SQL, [{'game_id': game_id, 'version': version}
+                                             for game_id, version in versions.items()])
+    db.session.commit()
+
+    return len(affected)
+
+
+def get_similar_game_ids(game_id, k=6):
+    """Returns the ids of up to k games most often liked together with game_id, from the stored neighbours"""
+    rows = (db.session.query(GameNeighbor.neighbor_id)
+            .filter_by(game_id=game_id)
+            .order_by(GameNeighbor.score.desc(), GameNeighbor.neighbor_id)
+            .limit(k))
+    return [neighbor_id for (neighbor_id,) in rows]
+
+
+def get_recommended_game_ids(liked_list, k=6):
+    """Receives a user's liked game ids, oldest first; returns up to k game ids they have not liked,
+    scored by summing the stored similarities to their most recent likes"""
+    liked = liked_list[-RECOMMEND_FROM_LIKES:]
+    if not liked:
+        return []
+
+    total = func.sum(GameNeighbor.score)
+    rows = (db.session.query(GameNeighbor.neighbor_id)
+            .filter(GameNeighbor.game_id.in_(liked), GameNeighbor.neighbor_id.notin_(liked_list))
+            .group_by(GameNeighbor.neighbor_id)
+            .order_by(total.desc(), GameNeighbor.neighbor_id)
+            .limit(k))
+    return [neighbor_id for (neighbor_id,) in rows]
@@ -0,0 +1,196 @@
+import re
+import heapq
+from bisect import bisect_left, insort
+from collections import Counter
+from threading import Lock
+
+from sqlalchemy import func
+
+from models import db, Game
+from catalog import catalog_version
+
+# Lowest trigram similarity that still counts as a match (the pg_trgm default)
+SIMILARITY_THRESHOLD = 0.3
+
+_WORDS = re.compile(r'\w+')
+
+
+def trigrams(text):
+    """Returns the set of trigrams in text, padding each word the way pg_trgm does"""
+    grams = set()
+    for word in _WORDS.findall(text.lower()):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class NameIndex:
+    """In-memory trigram index over game names; postings map each trigram to the ids of games containing it"""
+
+    def __init__(self, games):
+        """Build the index from (id, name, rank) tuples"""
+        self.names = {}
+        self.ranks = {}
+        self.sizes = {}
+        self.postings = {}
+
+        for id, name, rank in games:
+            grams = trigrams(name)
+            self.names[id] = name.lower()
+            self.ranks[id] = rank
+            self.sizes[id] = len(grams)
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(id)
+
+    def search(self, query):
+        """Returns the ids of games whose names match query, best match first;
+        scored by trigram similarity, with exact substring matches first and ties broken by rank"""
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(self.postings.get(gram, ()))
+
+        needle = query.lower().strip()
+        scored = []
+        for id, common in shared.items():
+            score = common / (len(query_grams) + self.sizes[id] - common)
+            contains = needle in self.names[id]
+            if contains or score >= SIMILARITY_THRESHOLD:
+                scored.append((not contains, -score, self.ranks[id], id))
+
+        scored.sort()
+        return [id for *_, id in scored]
+
+
+class PrefixIndex:
+    """Sorted array of lowercase name keys for prefix lookups with bisect.
+    Each game is keyed by its full name and by every later word in it,
+    so 'inv' finds 'Scythe: Invaders from Afar'."""
+
+    def __init__(self, games):
+        """Build the index from (id, name, rank) tuples"""
+        self.entries = []
+        self.keys = {}
+        for game in games:
+            self._add(game, sort=False)
+        self.entries.sort()
+
+    @staticmethod
+    def _keys_for(name):
+        lower = name.lower()
+        return [lower] + [lower[match.start():] for match in _WORDS.finditer(lower)][1:]
+
+    def _add(self, game, sort=True):
+        id, name, rank = game
+        keys = [(key, rank, id, name) for key in self._keys_for(name)]
+        self.keys[id] = keys
+        for entry in keys:
+            if sort:
+                insort(self.entries, entry)
+            else:
+                self.entries.append(entry)
+
+    def remove(self, id):
+        """Remove every key for a game id"""
+        for entry in self.keys.pop(id, []):
+            i = bisect_left(self.entries, entry)
+            if i < len(self.entries) and self.entries[i] == entry:
+                del self.entries[i]
+
+    def update(self, games):
+        """Add or replace the keys for each (id, name, rank) tuple"""
+        for game in games:
+            self.remove(game[0])
+            self._add(game)
+
+    def updated(self, games, removed=()):
+        """Returns a copy of the index with games added or replaced and the removed ids dropped,
+        leaving this one untouched for readers that are still using it"""
+        index = PrefixIndex([])
+        index.entries = list(self.entries)
+        index.keys = dict(self.keys)
+        for id in removed:
+            index.remove(id)
+        index.update(games)
+        return index
+
+    def complete(self, prefix, k=8):
+        """Returns up to k (id, name, rank) tuples whose name or a word in it starts with prefix,
+        most popular (lowest rank) first"""
+        prefix = prefix.lower().strip()
+        if not prefix:
+            return []
+
+        matches = {}
+        i = bisect_left(self.entries, (prefix,))
+        while i < len(self.entries) and self.entries[i][0].startswith(prefix):
+            key, rank, id, name = self.entries[i]
+            matches[id] = (rank, id, name)
+            i += 1
+
+        return [(id, name, rank) for rank, id, name in heapq.nsmallest(k, matches.values())]
+
+
+_index = None
+_index_version = None
+_prefix_index = None
+_prefix_version = None
+_prefix_updated = None
+_lock = Lock()
+
+
+def get_name_index():
+    """Returns this worker's name index, rebuilding it when the mirrored catalog has changed"""
+    global _index, _index_version
+
+    version = catalog_version()
+    if _index is None or version != _index_version:
+        with _lock:
+            if _index is None or version != _index_version:
+                _index = NameIndex(db.session.query(Game.id, Game.name, Game.rank).all())
+                _index_version = version
+    return _index
+
+
+def search_names(query):
+    """Returns the ids of mirrored games matching query, best match first"""
+    return get_name_index().search(query)
+
+
+def get_prefix_index():
+    """Returns this worker's prefix index; when the mirrored catalog changes, only the games
+    updated since the last build are re-keyed and the ones a sync dropped removed,
+    unless over a quarter of the catalog changed"""
+    global _prefix_index, _prefix_version, _prefix_updated
+
+    version = catalog_version()
+    if _prefix_index is not None and version == _prefix_version:
+        return _prefix_index
+
+    with _lock:
+        if _prefix_index is not None and version == _prefix_version:
+            return _prefix_index
+
+        columns = [Game.id, Game.name, Game.rank]
+        if _prefix_index is None or _prefix_updated is None:
+            changed = None
+        else:
+            changed = db.session.query(*columns).filter(Game.updated_at > _prefix_updated).all()
+            removed = _prefix_index.keys.keys() - {id for (id,) in db.session.query(Game.id)}
+
+        if changed is None or len(changed) + len(removed) > len(_prefix_index.keys) // 4:
+            _prefix_index = PrefixIndex(db.session.query(*columns).all())
+        else:
+            _prefix_index = _prefix_index.updated(changed, removed)
+
+        _prefix_updated = db.session.query(func.max(Game.updated_at)).scalar()
+        _prefix_version = version
+    return _prefix_index
+
+
+def autocomplete(prefix, k=8):
+    """Returns up to k mirrored games whose names start with prefix, most popular first"""
+    return get_prefix_index().complete(prefix, k)
@@ -0,0 +1,31 @@
+// Suggest game names in the navbar search box as the user types
+const searchInput = document.querySelector('#search');
+const suggestions = document.querySelector('#search-suggestions');
+let lastPrefix = '';
+
+async function showSuggestions() {
+    const prefix = searchInput.value.trim();
+    if (prefix === lastPrefix) return;
+    lastPrefix = prefix;
+
+    if (prefix.length < 2) {
+        suggestions.innerHTML = '';
+        return;
+    }
+
+    const resp = await axios.get('/api/autocomplete', { params: { q: prefix } });
+
+    // ignore responses that arrive after the user kept typing
+    if (prefix !== lastPrefix) return;
+
+    suggestions.innerHTML = '';
+    for (let game of resp.data.results) {
+        const option = document.createElement('option');
+        option.value = game.name;
+        suggestions.append(option);
+    }
+}
+
+if (searchInput && suggestions) {
+    searchInput.addEventListener('input', showSuggestions);
+}
@@ -0,0 +1,20 @@
+// Toggle likes in place through the JSON API instead of reloading the page
+async function toggleLike(evt) {
+    const form = evt.target.closest('form');
+    if (!form || !form.action.includes('/users/like_game/')) return;
+    evt.preventDefault();
+
+    const gameId = form.action.split('/users/like_game/')[1];
+    const button = form.querySelector('button');
+
+    try {
+        const resp = await axios.post(`/api/like_game/${gameId}`);
+        button.classList.toggle('btn-danger', resp.data.liked);
+        button.classList.toggle('btn-outline-dark', !resp.data.liked);
+    } catch (err) {
+        // fall back to the regular form post, which redirects to login if needed
+        form.submit();
+    }
+}
+
+document.addEventListener('submit', toggleLike);
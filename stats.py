@@ -0,0 +1,184 @@
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import text, desc, func
+from sqlalchemy.dialects.postgresql import insert
+
+from models import db, GameStat, Review
+from cursors import keyset_page
+
+# Trending scores halve every TRENDING_HALF_LIFE_DAYS. Rather than decaying every row over time,
+# each like or review adds weight * 2 ** (days since TRENDING_EPOCH / half-life), so newer activity
+# counts for more and rows never need rewriting; the ordering is the same as decaying them all.
+# Scores grow about 2 ** 52 a year at a 7 day half-life, well inside a float for over a decade;
+# move the epoch forward and run `flask rebuild-game-stats` long before then.
+TRENDING_HALF_LIFE_DAYS = float(os.environ.get('TRENDING_HALF_LIFE_DAYS', 7))
+TRENDING_EPOCH = datetime(2026, 1, 1)
+
+LIKE_WEIGHT = 1.0
+REVIEW_WEIGHT = 3.0
+
+
+def trending_weight(weight, when):
+    """Returns the trending score contributed by an event of the given weight at a (UTC) datetime"""
+    days = (when - TRENDING_EPOCH) / timedelta(days=1)
+    return weight * 2 ** (days / TRENDING_HALF_LIFE_DAYS)
+
+
+def bump_counts(like_deltas=None, review_deltas=None, trending_deltas=None):
+    """Receives dicts of game id -> change in like count, review count and trending score;
+    applies them to game_stats with one upsert, flagging games whose likes changed for new recommendations"""
+    like_deltas = like_deltas or {}
+    review_deltas = review_deltas or {}
+    trending_deltas = trending_deltas or {}
+
+    rows = [{'game_id': game_id,
+             'like_count': like_deltas.get(game_id, 0),
+             'review_count': review_deltas.get(game_id, 0),
+             'trending_score': trending_deltas.get(game_id, 0),
+             'neighbors_dirty': bool(like_deltas.get(game_id)),
+             'likes_version': 1 if like_deltas.get(game_id) else 0}
+            for game_id in set(like_deltas) | set(review_deltas) | set(trending_deltas)
+            if like_deltas.get(game_id) or review_deltas.get(game_id) or trending_deltas.get(game_id)]
+    if not rows:
+        return
+
+    stmt = insert(GameStat.__table__).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[GameStat.game_id],
+        set_={'like_count': GameStat.like_count + stmt.excluded.like_count,
+              'review_count': GameStat.review_count + stmt.excluded.review_count,
+              # rounding can leave a tiny negative score once everything is removed
+              'trending_score': func.greatest(GameStat.trending_score + stmt.excluded.trending_score, 0),
+              'neighbors_dirty': GameStat.neighbors_dirty | stmt.excluded.neighbors_dirty,
+              'likes_version': GameStat.likes_version + stmt.excluded.likes_version})
+    db.session.execute(stmt)
+
+
+def record_likes_changed(added, removed):
+    """Receives lists of (game id, timestamp) for likes added and removed;
+    moves the like counts, and the trending scores by each like's weight at the time it was made"""
+    like_deltas = {}
+    trending_deltas = {}
+    for rows, sign in ((added, 1), (removed, -1)):
+        for game_id, timestamp in rows:
+            like_deltas[game_id] = like_deltas.get(game_id, 0) + sign
+            if timestamp is not None:
+                trending_deltas[game_id] = (trending_deltas.get(game_id, 0)
+                                            + sign * trending_weight(LIKE_WEIGHT, timestamp))
+    bump_counts(like_deltas, trending_deltas=trending_deltas)
+
+
+def record_review_added(review):
+    """Count a new review and make it the game's latest; call after the review is flushed"""
+    bump_counts(review_deltas={review.game_id: 1},
+                trending_deltas={review.game_id: trending_weight(REVIEW_WEIGHT, review.timestamp)})
+    GameStat.query.filter_by(game_id=review.game_id).update(
+        {'latest_review_id': review.id, 'latest_review_at': review.timestamp},
+        synchronize_session=False)
+
+
+def refresh_latest_review(game_id):
+    """Point a game's stats at its newest remaining review, using the (game_id, timestamp) index"""
+    latest = (db.session.query(Review.id, Review.timestamp)
+              .filter_by(game_id=game_id)
+              .order_by(desc(Review.timestamp), desc(Review.id))
+              .first())
+    GameStat.query.filter_by(game_id=game_id).update(
+        {'latest_review_id': latest.id if latest else None,
+         'latest_review_at': latest.timestamp if latest else None},
+        synchronize_session=False)
+
+
+def record_review_deleted(review):
+    """Uncount a deleted review and refresh the game's latest review; call after the delete is flushed"""
+    bump_counts(review_deltas={review.game_id: -1},
+                trending_deltas={review.game_id: -trending_weight(REVIEW_WEIGHT, review.timestamp)})
+    refresh_latest_review(review.game_id)
+
+
+def record_user_deleted(username):
+    """Uncount all likes and reviews of a user that is about to be deleted;
+    returns the ids of the games they reviewed"""
+    params = {'username': username}
+    likes = db.session.execute(
+        text('SELECT game_id, timestamp FROM likes WHERE user_username = :username'), params).all()
+    reviews = db.session.execute(
+        text('SELECT game_id, timestamp FROM reviews WHERE user_username = :username'), params).all()
+
+    like_deltas = {}
+    review_deltas = {}
+    trending_deltas = {}
+    for deltas, rows, weight in ((like_deltas, likes, LIKE_WEIGHT), (review_deltas, reviews, REVIEW_WEIGHT)):
+        for game_id, timestamp in rows:
+            deltas[game_id] = deltas.get(game_id, 0) - 1
+            if timestamp is not None:
+                trending_deltas[game_id] = trending_deltas.get(game_id, 0) - trending_weight(weight, timestamp)
+
+    bump_counts(like_deltas, review_deltas, trending_deltas)
+    return list(review_deltas)
+
+
+REBUILD_GAME_STATS_SQL = text("""
+    INSERT INTO game_stats (game_id, like_count, review_count, latest_review_id, latest_review_at, trending_score,
+                            neighbors_dirty, likes_version)
+    SELECT game_id,
+           coalesce(l.like_count, 0),
+           coalesce(r.review_count, 0),
+           latest.id,
+           latest.timestamp,
+           coalesce(l.trending, 0) + coalesce(r.trending, 0),
+           l.like_count IS NOT NULL,
+           0
+    FROM (SELECT game_id, count(*) AS like_count,
+                 sum(:like_weight * power(2, extract(epoch FROM timestamp - :epoch) / :half_life)) AS trending
+          FROM likes GROUP BY game_id) l
+    FULL OUTER JOIN (SELECT game_id, count(*) AS review_count,
+                            sum(:review_weight * power(2, extract(epoch FROM timestamp - :epoch) / :half_life)) AS trending
+                     FROM reviews GROUP BY game_id) r USING (game_id)
+    LEFT JOIN (SELECT DISTINCT ON (game_id) game_id, id, timestamp
+               FROM reviews
+               ORDER BY game_id, timestamp DESC, id DESC) latest USING (game_id)
+""")
+
+
+def rebuild_game_stats():
+    """Recompute game_stats from the likes and reviews tables; returns the number of games"""
+    db.session.execute(text('DELETE FROM game_stats'))
+    db.session.execute(REBUILD_GAME_STATS_SQL, {
+        'like_weight': LIKE_WEIGHT,
+        'review_weight': REVIEW_WEIGHT,
+        'epoch': TRENDING_EPOCH,
+        'half_life': TRENDING_HALF_LIFE_DAYS * 86400,
+    })
+    return GameStat.query.count()
+
+
+def get_game_stats(game_ids):
+    """Returns a dict of game id -> GameStat for the given ids, in one query"""
+    if not game_ids:
+        return {}
+    return {stat.game_id: stat for stat in GameStat.query.filter(GameStat.game_id.in_(game_ids))}
+
+
+# Leaderboards by name, each a unique sort key walked highest first
+LEADERBOARDS = {
+    'Trending': [GameStat.trending_score, GameStat.game_id],
+    'MostLiked': [GameStat.like_count, GameStat.game_id],
+}
+
+
+def leaderboard_page(board, num, limit, cursor=None):
+    """Read one page of a community leaderboard ('Trending' or 'MostLiked') from game_stats,
+    walking the board's (score, game_id) index from the top;
+    returns [game ids, count, cursors], or [] if no game has any activity yet"""
+    columns = LEADERBOARDS[board]
+    q = GameStat.query.filter(columns[0] > 0)
+
+    count = q.count()
+    if not count:
+        return []
+
+    stats, cursors = keyset_page(q, columns, cursor, limit, descending=True, offset=limit * (max(num, 1) - 1))
+
+    return [[stat.game_id for stat in stats], count, cursors]
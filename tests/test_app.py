@@ -1,12 +1,15 @@
 import os
+import threading
+import time
 from unittest import TestCase
-from sqlalchemy import exc
+from sqlalchemy import exc, text
 
 from models import db, connect_db, User, Review, Like
 
 os.environ['DATABASE_URL'] = "postgresql:///boardgames_test"
 
 from app import app, CURR_USER
+from helpers import toggle_like
 
 db.create_all()
 
@@ -236,3 +239,111 @@ class UserLoginAndAuthenticationViewFunctionsTestModel(TestCase):
             resp=c.get('logout', follow_redirects=True)
             self.assertIn('See you next time', str(resp.data))
 
+
+
+class LikeViewFunctionsTestCase(TestCase):
+    """Tests the routes for liking and unliking games"""
+
+    def setUp(self):
+        """Create test client, add sample data."""
+
+        Like.query.delete()
+        User.query.delete()
+
+        self.client = app.test_client()
+
+        self.test_user = User.register(username='test1',
+                                    email='test@test.com',
+                                    password='test')
+
+        db.session.commit()
+
+    def tearDown(self):
+        resp = super().tearDown()
+        db.session.rollback()
+        return resp
+
+    def test_like_game_json(self):
+        """Test that the JSON like route toggles the like and returns the new state"""
+
+        with self.client as c:
+            resp = c.post('/api/like_game/yqR4PtpO8X')
+            self.assertEqual(resp.status_code, 401)
+
+            with c.session_transaction() as sess:
+                sess[CURR_USER] = self.test_user.username
+
+            resp = c.post('/api/like_game/yqR4PtpO8X')
+            self.assertEqual(resp.json, {'game_id': 'yqR4PtpO8X', 'liked': True})
+            self.assertEqual(Like.query.filter_by(user_username='test1').count(), 1)
+
+            resp = c.post('/api/like_game/yqR4PtpO8X')
+            self.assertEqual(resp.json, {'game_id': 'yqR4PtpO8X', 'liked': False})
+            self.assertEqual(Like.query.filter_by(user_username='test1').count(), 0)
+
+    def test_like_game_concurrent_double_click(self):
+        """Test that a toggle racing one that liked the game first, which then neither adds nor removes a row,
+        still reports the game as liked"""
+
+        other = db.engine.connect()
+        transaction = other.begin()
+        other.execute(text("INSERT INTO likes (user_username, game_id, timestamp) VALUES ('test1', 'yqR4PtpO8X', now())"))
+
+        result = {}
+
+        def toggle():
+            with app.app_context():
+                result['liked'] = toggle_like('test1', 'yqR4PtpO8X')
+                db.session.commit()
+
+        thread = threading.Thread(target=toggle)
+        thread.start()
+        # wait until the toggle's INSERT is blocked on the uncommitted like
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and not db.session.execute(
+                text("SELECT count(*) FROM pg_stat_activity WHERE wait_event_type = 'Lock'")).scalar():
+            time.sleep(0.01)
+        transaction.commit()
+        other.close()
+        thread.join()
+
+        self.assertTrue(result['liked'])
+        self.assertEqual(Like.query.filter_by(user_username='test1').count(), 1)
+
+    def test_bulk_like_games(self):
+        """Test that bulk like operations are applied together and the liked set is returned"""
+
+        with self.client as c:
+            with c.session_transaction() as sess:
+                sess[CURR_USER] = self.test_user.username
+
+            resp = c.post('/api/likes/bulk', json={'operations': [
+                {'op': 'add', 'game_id': 'game1'},
+                {'op': 'add', 'game_id': 'game2'},
+                {'op': 'add', 'game_id': 'game3'},
+                {'op': 'remove', 'game_id': 'game2'},
+            ]})
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(resp.json, {'liked': ['game1', 'game3']})
+
+            resp = c.post('/api/likes/bulk', json={'operations': [{'op': 'like', 'game_id': 'game1'}]})
+            self.assertEqual(resp.status_code, 400)
+
+    def test_like_invalid_game_id(self):
+        """Test that game ids that are not short alphanumeric strings are rejected before touching the likes table"""
+
+        with self.client as c:
+            with c.session_transaction() as sess:
+                sess[CURR_USER] = self.test_user.username
+
+            resp = c.post('/api/like_game/not-a-game')
+            self.assertEqual(resp.status_code, 404)
+            resp = c.post(f'/api/like_game/{"a" * 33}')
+            self.assertEqual(resp.status_code, 404)
+            resp = c.post('/users/like_game/not-a-game')
+            self.assertEqual(resp.status_code, 404)
+
+            resp = c.post('/api/likes/bulk', json={'operations': [{'op': 'add', 'game_id': 'game1'},
+                                                                  {'op': 'add', 'game_id': 'game 2'}]})
+            self.assertEqual(resp.status_code, 400)
+            self.assertEqual(Like.query.filter_by(user_username='test1').count(), 0)
@@ -0,0 +1,101 @@
+import time
+from threading import Thread, Event
+from unittest import TestCase
+
+from cache import TTLCache, SingleFlight, normalize_endpoint, ttl_for, ENDPOINT_TTLS
+
+
+class TTLCacheTestCase(TestCase):
+    """Test the LRU + TTL cache used in front of the BGA API"""
+
+    def test_hit_and_miss_counters(self):
+        """Does the cache count hits and misses?"""
+        cache = TTLCache(max_entries=10)
+
+        self.assertIsNone(cache.get('a'))
+        cache.set('a', [1, 2])
+        self.assertEqual(cache.get('a'), [1, 2])
+
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_expired_entries_miss(self):
+        """Do entries past their TTL stop being returned?"""
+        cache = TTLCache(max_entries=10)
+        cache.set('a', 'value', ttl=0)
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+    def test_lru_eviction(self):
+        """Is the least recently used entry evicted when the cache is full?"""
+        cache = TTLCache(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_byte_budget_eviction(self):
+        """Are least recently used entries evicted to keep the total size under max_bytes?"""
+        cache = TTLCache(max_entries=10, max_bytes=10)
+        cache.set('a', 'xxxx')
+        cache.set('b', 'yyyy')
+        cache.set('a', 'xxxxx')
+        cache.set('c', 'zzzz')
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 'xxxxx')
+        self.assertEqual(cache.stats()['bytes'], 9)
+
+
+class NormalizeEndpointTestCase(TestCase):
+    """Test cache key normalization for BGA endpoints"""
+
+    def test_client_id_and_param_order_ignored(self):
+        key1 = normalize_endpoint('/search/?order_by=rank&limit=12&client_id=abc')
+        key2 = normalize_endpoint('/search?limit=12&order_by=rank&client_id=xyz')
+
+        self.assertEqual(key1, key2)
+        self.assertNotIn('client_id', key1)
+
+    def test_ttl_for_endpoint(self):
+        self.assertEqual(ttl_for('/game/videos?game_id=1'), dict(ENDPOINT_TTLS)['/game/videos'])
+
+
+class SingleFlightTestCase(TestCase):
+    """Test coalescing of concurrent identical calls"""
+
+    def test_concurrent_calls_share_one_result(self):
+        """Do concurrent callers of one key wait on a single call?"""
+        flights = SingleFlight()
+        started = Event()
+        release = Event()
+        calls = []
+
+        def slow_fetch():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return ['games', 1]
+
+        results = []
+        leader = Thread(target=lambda: results.append(flights.do('key', slow_fetch)))
+        leader.start()
+        started.wait()
+
+        followers = [Thread(target=lambda: results.append(flights.do('key', slow_fetch))) for i in range(3)]
+        for t in followers:
+            t.start()
+        while flights.coalesced < 3:
+            time.sleep(0.001)
+        release.set()
+        for t in [leader] + followers:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [['games', 1]] * 4)
+        self.assertEqual(flights.stats(), {'calls': 1, 'coalesced': 3})
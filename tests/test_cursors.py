@@ -0,0 +1,101 @@
+from datetime import datetime
+from unittest import TestCase
+
+from sqlalchemy import create_engine, Column, Integer, String, DateTime
+from sqlalchemy.orm import declarative_base, Session
+
+from cursors import encode_cursor, decode_cursor, keyset_page
+
+Base = declarative_base()
+
+
+class Row(Base):
+    __tablename__ = 'rows'
+
+    id = Column(String, primary_key=True)
+    rank = Column(Integer, nullable=False)
+    timestamp = Column(DateTime)
+
+
+class DecodeCursorTestCase(TestCase):
+    """Test decoding cursor tokens back into sort key values"""
+
+    columns = [Row.rank, Row.id]
+
+    def test_round_trip(self):
+        token = encode_cursor([3, 'c'], 'next')
+        self.assertEqual(decode_cursor(token, self.columns), ([3, 'c'], 'next'))
+
+    def test_datetime_round_trip(self):
+        when = datetime(2026, 10, 18, 12, 30)
+        token = encode_cursor([when, 'c'], 'prev')
+        self.assertEqual(decode_cursor(token, [Row.timestamp, Row.id]), ([when, 'c'], 'prev'))
+
+    def test_malformed_tokens(self):
+        """Are garbage, wrong lengths, bad directions and wrongly typed values all rejected?"""
+        for token in [None, '', 'not base64!', encode_cursor([3], 'next'), encode_cursor([3, 'c'], 'up'),
+                      encode_cursor([{}, 'a'], 'next'), encode_cursor(['3', 'c'], 'next'),
+                      encode_cursor([True, 'c'], 'next'), encode_cursor([3, 4], 'next'),
+                      encode_cursor([3, 'c'], 'next')[:-2]]:
+            self.assertIsNone(decode_cursor(token, self.columns), token)
+
+        self.assertIsNone(decode_cursor(encode_cursor([5, 'c'], 'next'), [Row.timestamp, Row.id]))
+        self.assertIsNone(decode_cursor(encode_cursor(['yesterday', 'c'], 'next'), [Row.timestamp, Row.id]))
+
+
+class KeysetPageTestCase(TestCase):
+    """Test walking pages forwards and backwards with cursor tokens"""
+
+    def setUp(self):
+        engine = create_engine('sqlite://')
+        Base.metadata.create_all(engine)
+        self.session = Session(engine)
+        # ranks repeat, so the id breaks ties
+        self.session.add_all([Row(id=f'g{i}', rank=i // 2) for i in range(7)])
+        self.session.commit()
+        self.columns = [Row.rank, Row.id]
+
+    def tearDown(self):
+        self.session.close()
+
+    def page(self, token, descending=False, offset=0):
+        rows, cursors = keyset_page(self.session.query(Row), self.columns, token, 3,
+                                    descending=descending, offset=offset)
+        return [row.id for row in rows], cursors
+
+    def test_next_and_prev_ascending(self):
+        first, cursors = self.page(None)
+        self.assertEqual(first, ['g0', 'g1', 'g2'])
+        self.assertIsNone(cursors['prev'])
+
+        second, cursors = self.page(cursors['next'])
+        self.assertEqual(second, ['g3', 'g4', 'g5'])
+
+        last, last_cursors = self.page(cursors['next'])
+        self.assertEqual(last, ['g6'])
+        self.assertIsNone(last_cursors['next'])
+
+        back, back_cursors = self.page(cursors['prev'])
+        self.assertEqual(back, first)
+        self.assertIsNone(back_cursors['prev'])
+
+    def test_next_and_prev_descending(self):
+        first, cursors = self.page(None, descending=True)
+        self.assertEqual(first, ['g6', 'g5', 'g4'])
+
+        second, cursors = self.page(cursors['next'], descending=True)
+        self.assertEqual(second, ['g3', 'g2', 'g1'])
+
+        back, back_cursors = self.page(cursors['prev'], descending=True)
+        self.assertEqual(back, first)
+        self.assertIsNone(back_cursors['prev'])
+        self.assertIsNotNone(back_cursors['next'])
+
+    def test_offset_without_token(self):
+        """Does a plain page number still work, with a prev cursor back to the start?"""
+        rows, cursors = self.page(None, offset=3)
+        self.assertEqual(rows, ['g3', 'g4', 'g5'])
+        self.assertEqual(self.page(cursors['prev'])[0], ['g0', 'g1', 'g2'])
+
+    def test_bad_token_starts_from_offset(self):
+        self.assertEqual(self.page(encode_cursor([{}, 'a'], 'next'))[0], ['g0', 'g1', 'g2'])
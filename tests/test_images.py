@@ -0,0 +1,109 @@
+import os
+import tempfile
+import threading
+from io import BytesIO
+from unittest import TestCase
+
+from PIL import Image
+
+import images
+
+
+def make_image(size, mode='RGB', fmt='PNG'):
+    out = BytesIO()
+    Image.new(mode, size).save(out, fmt)
+    return out.getvalue()
+
+
+class ResizeTestCase(TestCase):
+    """Test shrinking upstream images to the fixed proxy sizes"""
+
+    def test_fits_box_keeping_aspect_ratio(self):
+        data = images.resize(make_image((2000, 1000)), (640, 480))
+        with Image.open(BytesIO(data)) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (640, 320))
+
+    def test_transparent_images_become_jpeg(self):
+        data = images.resize(make_image((300, 300), mode='RGBA'), (256, 256))
+        with Image.open(BytesIO(data)) as image:
+            self.assertEqual((image.mode, image.size), ('RGB', (256, 256)))
+
+
+class EvictImagesTestCase(TestCase):
+    """Test the size cap on the on-disk image cache"""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.old_dir = images.IMAGE_CACHE_DIR
+        images.IMAGE_CACHE_DIR = self.dir.name
+
+    def tearDown(self):
+        images.IMAGE_CACHE_DIR = self.old_dir
+        self.dir.cleanup()
+
+    def test_least_recently_used_evicted_first(self):
+        """Are the oldest files deleted until the cache is under the low water mark?"""
+        for i, name in enumerate(['a', 'b', 'c', 'd']):
+            path = os.path.join(self.dir.name, f'{name}-card.jpg')
+            with open(path, 'wb') as f:
+                f.write(b'x' * 100)
+            os.utime(path, (1000 + i, 1000 + i))
+
+        total = images.evict_images(max_bytes=300)
+
+        self.assertEqual(total, 200)
+        self.assertEqual(sorted(os.listdir(self.dir.name)), ['c-card.jpg', 'd-card.jpg'])
+
+
+class GetImageFileTestCase(TestCase):
+    """Test filling the image cache from upstream"""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.old_dir = images.IMAGE_CACHE_DIR
+        self.old_fetch = images.fetch_bytes
+        images.IMAGE_CACHE_DIR = self.dir.name
+
+    def tearDown(self):
+        images.IMAGE_CACHE_DIR = self.old_dir
+        images.fetch_bytes = self.old_fetch
+        self.dir.cleanup()
+
+    def test_concurrent_misses_share_one_download(self):
+        """Does every caller get the cached path, not just the one that downloaded?"""
+        fetches = []
+        release = threading.Event()
+
+        def fetch(url, max_bytes):
+            fetches.append(url)
+            release.wait(5)
+            return make_image((800, 600))
+
+        images.fetch_bytes = fetch
+        coalesced = images.image_flights.coalesced
+        paths = []
+        threads = [threading.Thread(target=lambda: paths.append(images.get_image_file('g1', 'thumb', 'http://img/g1')))
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+        while images.image_flights.coalesced < coalesced + 3 and any(thread.is_alive() for thread in threads):
+            release.wait(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(fetches, ['http://img/g1'])
+        self.assertEqual(paths, [images.image_path('g1', 'thumb')] * 4)
+        self.assertEqual(images.cached_image_file('g1', 'card'), images.image_path('g1', 'card'))
+
+    def test_decompression_bomb_is_an_image_error(self):
+        images.fetch_bytes = lambda url, max_bytes: make_image((200, 200))
+        old_max = Image.MAX_IMAGE_PIXELS
+        Image.MAX_IMAGE_PIXELS = 100
+        try:
+            with self.assertRaises(images.IMAGE_ERRORS):
+                images.get_image_file('g2', 'thumb', 'http://img/g2')
+        finally:
+            Image.MAX_IMAGE_PIXELS = old_max
+        self.assertIsNone(images.cached_image_file('g2', 'thumb'))
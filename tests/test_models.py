@@ -2,7 +2,7 @@ import os
 from unittest import TestCase
 from sqlalchemy import exc
 
-from models import db, User, Review, Like
+from models import db, User, Review, Like, Game, Category
 
 os.environ['DATABASE_URL'] = "postgresql:///boardgames_test"
 
@@ -141,3 +141,32 @@ class ReviewModelTest(TestCase):
         db.session.commit()
 
         self.assertIn(review, self.test1.game_reviews)
+
+
+class GameModelTest(TestCase):
+    """Test model for the local game catalog mirror"""
+
+    def setUp(self):
+        """Add a mirrored game with one category"""
+
+        Game.query.delete()
+
+        category = Category.query.get('testcat') or Category(id='testcat', name='Test Category')
+        game = Game(id='test123', name='Test Game', rank=1, min_players=2, max_players=4,
+                    primary_publisher='Test Publisher', categories=[category])
+        db.session.add(game)
+        db.session.commit()
+
+    def tearDown(self):
+        """Tear down test client to start clean after each test"""
+        res = super().tearDown()
+        db.session.rollback()
+        return res
+
+    def test_game_to_dict(self):
+        """Does a mirrored game serialize in the same shape as the API JSON?"""
+        game = Game.query.get('test123').to_dict()
+
+        self.assertEqual(game['name'], 'Test Game')
+        self.assertEqual(game['primary_publisher']['name'], 'Test Publisher')
+        self.assertEqual(game['categories'], [{'id': 'testcat'}])
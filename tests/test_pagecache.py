@@ -0,0 +1,97 @@
+from unittest import TestCase
+
+from flask import Flask, g, session, flash, render_template_string
+
+from pagecache import cache_anonymous_page, page_cache
+
+app = Flask(__name__)
+app.config['SECRET_KEY'] = 'test'
+
+renders = []
+
+
+@app.before_request
+def add_user_to_g():
+    g.user = session.get('user')
+
+
+@app.route('/page')
+@cache_anonymous_page
+def page():
+    renders.append(1)
+    return render_template_string('<p>{{ "x" * 2000 }} {{ g.user or "anonymous" }}</p>')
+
+
+@app.route('/flash')
+@cache_anonymous_page
+def page_with_flash():
+    flash('hello')
+    return 'flashed'
+
+
+class PageCacheTestCase(TestCase):
+    """Test the anonymous full-page cache and its conditional GET handling"""
+
+    def setUp(self):
+        page_cache.clear()
+        renders.clear()
+        self.client = app.test_client()
+
+    def test_miss_then_hit(self):
+        """Is the second anonymous request served from the cache with identical bytes?"""
+        first = self.client.get('/page')
+        second = self.client.get('/page')
+
+        self.assertEqual(first.headers['X-Page-Cache'], 'MISS')
+        self.assertEqual(second.headers['X-Page-Cache'], 'HIT')
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(len(renders), 1)
+        self.assertIn('public', second.headers['Cache-Control'])
+        self.assertIn('Cookie', second.headers['Vary'])
+
+    def test_if_none_match_gets_304(self):
+        etag = self.client.get('/page').headers['ETag']
+        resp = self.client.get('/page', headers={'If-None-Match': etag})
+
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp.data, b'')
+
+    def test_compressed_variant_has_its_own_etag(self):
+        plain = self.client.get('/page').headers['ETag']
+        resp = self.client.get('/page', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(resp.headers['Content-Encoding'], 'gzip')
+        self.assertNotEqual(resp.headers['ETag'], plain)
+        resp = self.client.get('/page', headers={'Accept-Encoding': 'gzip', 'If-None-Match': resp.headers['ETag']})
+        self.assertEqual(resp.status_code, 304)
+
+    def test_logged_in_bypass(self):
+        """Does a logged in user skip the cache and get a private response?"""
+        self.client.get('/page')
+        with self.client.session_transaction() as sess:
+            sess['user'] = 'bob'
+        resp = self.client.get('/page')
+
+        self.assertNotIn('X-Page-Cache', resp.headers)
+        self.assertIn('private', resp.headers['Cache-Control'])
+        self.assertIn(b'bob', resp.data)
+        self.assertEqual(len(renders), 2)
+
+    def test_csrf_token_only_session_still_cached(self):
+        """Does a visitor who was only given a CSRF token still count as anonymous?"""
+        self.client.get('/page')
+        with self.client.session_transaction() as sess:
+            sess['csrf_token'] = 'abc'
+        resp = self.client.get('/page')
+
+        self.assertEqual(resp.headers['X-Page-Cache'], 'HIT')
+
+    def test_flashed_messages_not_cached(self):
+        resp = self.client.get('/flash')
+        self.assertNotIn('X-Page-Cache', resp.headers)
+        self.assertEqual(len(page_cache), 0)
+
+        with self.client.session_transaction() as sess:
+            self.assertIn('_flashes', sess)
+        self.client.get('/page')
+        self.assertEqual(len(page_cache), 0)
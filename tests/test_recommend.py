@@ -0,0 +1,38 @@
+from unittest import TestCase
+
+from recommend import likes_matrix, co_liked, top_neighbors
+
+
+class NeighborsTestCase(TestCase):
+    """Test the item-item cosine similarity over the likes matrix"""
+
+    def setUp(self):
+        self.matrix, self.games = likes_matrix([('ann', 'a'), ('ann', 'b'),
+                                                ('bob', 'a'), ('bob', 'b'), ('bob', 'c'),
+                                                ('cat', 'c'), ('cat', 'd'),
+                                                ('dan', 'e')])
+        self.col = {game_id: col for col, game_id in enumerate(self.games)}
+
+    def neighbors_of(self, game_id, k=10):
+        pairs = top_neighbors(self.matrix, [self.col[game_id]], k)[self.col[game_id]]
+        return [(self.games[col], round(score, 3)) for col, score in pairs]
+
+    def test_cosine_similarity_ordering(self):
+        """Are neighbours scored by cosine similarity, most similar first, without the game itself?"""
+        self.assertEqual(self.neighbors_of('a'), [('b', 1.0), ('c', 0.5)])
+        self.assertEqual(self.neighbors_of('c'), [('d', 0.707), ('a', 0.5), ('b', 0.5)])
+
+    def test_top_k(self):
+        self.assertEqual(self.neighbors_of('c', k=1), [('d', 0.707)])
+
+    def test_no_co_likes(self):
+        self.assertEqual(self.neighbors_of('e'), [])
+
+    def test_co_liked(self):
+        """Are the games sharing a user with a changed game found for an incremental refresh?"""
+        found = {self.games[col] for col in co_liked(self.matrix, [self.col['d']])}
+        self.assertEqual(found, {'c', 'd'})
+
+    def test_duplicate_likes_count_once(self):
+        matrix, games = likes_matrix([('ann', 'a'), ('ann', 'a'), ('ann', 'b')])
+        self.assertEqual(matrix.sum(), 2)
@@ -0,0 +1,58 @@
+from unittest import TestCase
+
+from search_index import NameIndex, PrefixIndex, trigrams
+
+
+class NameIndexTestCase(TestCase):
+    """Test the in-memory trigram index used for name searches"""
+
+    def setUp(self):
+        self.index = NameIndex([('a', 'Scythe', 20),
+                                ('b', 'Gloomhaven', 1),
+                                ('c', 'Scythe: Invaders from Afar', 150),
+                                ('d', 'Wingspan', 5)])
+
+    def test_trigrams(self):
+        self.assertEqual(trigrams('Cat'), {'  c', ' ca', 'cat', 'at '})
+
+    def test_exact_name_ranks_first(self):
+        """Does the closest name come before longer names containing the query?"""
+        self.assertEqual(self.index.search('scythe'), ['a', 'c'])
+
+    def test_misspelled_query_matches(self):
+        """Does a fuzzy match still find the game?"""
+        self.assertEqual(self.index.search('gloomhavn')[0], 'b')
+
+    def test_no_match(self):
+        self.assertEqual(self.index.search('zzzz'), [])
+        self.assertEqual(self.index.search('  '), [])
+
+
+class PrefixIndexTestCase(TestCase):
+    """Test the sorted prefix index behind the autocomplete endpoint"""
+
+    def setUp(self):
+        self.index = PrefixIndex([('a', 'Scythe', 20),
+                                  ('b', 'Gloomhaven', 1),
+                                  ('c', 'Scythe: Invaders from Afar', 150)])
+
+    def test_prefix_matches_by_rank(self):
+        """Are matches on the name or a later word returned most popular first?"""
+        self.assertEqual(self.index.complete('sc'), [('a', 'Scythe', 20), ('c', 'Scythe: Invaders from Afar', 150)])
+        self.assertEqual(self.index.complete('inv'), [('c', 'Scythe: Invaders from Afar', 150)])
+        self.assertEqual(self.index.complete('sc', k=1), [('a', 'Scythe', 20)])
+
+    def test_incremental_update(self):
+        """Does an updated copy re-key changed games without touching the original?"""
+        updated = self.index.updated([('a', 'Wingspan', 20)])
+
+        self.assertEqual(updated.complete('wing'), [('a', 'Wingspan', 20)])
+        self.assertEqual(updated.complete('scythe'), [('c', 'Scythe: Invaders from Afar', 150)])
+        self.assertEqual(self.index.complete('wing'), [])
+
+    def test_incremental_removal(self):
+        """Does an updated copy drop games that left the catalog?"""
+        updated = self.index.updated([], removed=['a'])
+
+        self.assertEqual(updated.complete('scythe'), [('c', 'Scythe: Invaders from Afar', 150)])
+        self.assertEqual(len(self.index.complete('scythe')), 2)
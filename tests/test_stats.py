@@ -0,0 +1,105 @@
+import os
+from datetime import timedelta
+from unittest import TestCase
+
+from models import db, GameStat
+
+os.environ['DATABASE_URL'] = "postgresql:///boardgames_test"
+
+from app import app
+from stats import TRENDING_EPOCH, TRENDING_HALF_LIFE_DAYS, trending_weight, bump_counts, leaderboard_page
+
+db.create_all()
+
+
+class TrendingWeightTestCase(TestCase):
+    """Test the growing weight that stands in for decaying trending scores"""
+
+    def test_weight_at_epoch(self):
+        self.assertEqual(trending_weight(3.0, TRENDING_EPOCH), 3.0)
+
+    def test_weight_doubles_every_half_life(self):
+        """Does an event one half-life later count twice as much, so older scores decay relative to it?"""
+        later = TRENDING_EPOCH + timedelta(days=TRENDING_HALF_LIFE_DAYS)
+        self.assertAlmostEqual(trending_weight(1.0, later), 2.0)
+        self.assertAlmostEqual(trending_weight(1.0, later + timedelta(days=TRENDING_HALF_LIFE_DAYS)), 4.0)
+
+
+class BumpCountsTestCase(TestCase):
+    """Test applying like, review and trending deltas to game_stats"""
+
+    def setUp(self):
+        GameStat.query.delete()
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.rollback()
+
+    def test_insert_and_add(self):
+        """Are new games inserted and existing ones incremented, with like changes flagging neighbours?"""
+        bump_counts({'a': 1}, {'b': 2}, {'a': 1.5, 'b': 6.0})
+        db.session.commit()
+
+        a = GameStat.query.get('a')
+        b = GameStat.query.get('b')
+        self.assertEqual((a.like_count, a.review_count, a.trending_score), (1, 0, 1.5))
+        self.assertEqual((b.like_count, b.review_count, b.trending_score), (0, 2, 6.0))
+        self.assertTrue(a.neighbors_dirty)
+        self.assertFalse(b.neighbors_dirty)
+
+        bump_counts({'a': 2, 'b': 1}, trending_deltas={'a': 1.0})
+        db.session.commit()
+        db.session.expire_all()
+
+        a = GameStat.query.get('a')
+        self.assertEqual((a.like_count, a.trending_score, a.likes_version), (3, 2.5, 2))
+        self.assertTrue(GameStat.query.get('b').neighbors_dirty)
+
+    def test_trending_score_never_negative(self):
+        bump_counts({'a': 1}, trending_deltas={'a': 1.0})
+        bump_counts({'a': -1}, trending_deltas={'a': -1.0000001})
+        db.session.commit()
+
+        self.assertEqual(GameStat.query.get('a').trending_score, 0)
+
+    def test_zero_deltas_write_nothing(self):
+        bump_counts({'a': 0}, {'a': 0}, {'a': 0})
+        db.session.commit()
+
+        self.assertIsNone(GameStat.query.get('a'))
+
+
+class LeaderboardPageTestCase(TestCase):
+    """Test reading the community leaderboards from game_stats"""
+
+    def setUp(self):
+        GameStat.query.delete()
+        db.session.add_all([GameStat(game_id=f'g{i}', like_count=i, trending_score=float(i % 3)) for i in range(6)])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.rollback()
+
+    def test_most_liked_pages(self):
+        """Are games with likes listed most liked first, a page at a time, with working cursors?"""
+        ids, count, cursors = leaderboard_page('MostLiked', 1, 2)
+        self.assertEqual((ids, count), (['g5', 'g4'], 5))
+
+        ids, count, cursors = leaderboard_page('MostLiked', 2, 2, cursors['next'])
+        self.assertEqual(ids, ['g3', 'g2'])
+
+        self.assertEqual(leaderboard_page('MostLiked', 1, 2, cursors['prev'])[0], ['g5', 'g4'])
+        self.assertEqual(leaderboard_page('MostLiked', 3, 2)[0], ['g1'])
+
+    def test_trending_ties_broken_by_game_id(self):
+        ids, count, cursors = leaderboard_page('Trending', 1, 10)
+        self.assertEqual((ids, count), (['g5', 'g2', 'g4', 'g1'], 4))
+
+    def test_page_numbers_below_one(self):
+        self.assertEqual(leaderboard_page('MostLiked', 0, 2)[0], ['g5', 'g4'])
+
+    def test_empty_board(self):
+        GameStat.query.delete()
+        db.session.commit()
+
+        self.assertEqual(leaderboard_page('Trending', 1, 10), [])
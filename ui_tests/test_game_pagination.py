@@ -1,3 +1,5 @@
+from urllib.parse import urlparse
+
 from seleniumbase import BaseCase
 
 base_url = 'https://duncans-toy-chest.herokuapp.com/'
@@ -49,15 +51,15 @@ class BaseTestCase(BaseCase):
 class GamePaginationJourney(BaseTestCase):
     """
     Feature: Basic pagination is functional; 
-    Next and Back buttons appear on bottom of page when there are more than 10 games in a search
+    Next and Back buttons appear on bottom of page when there are more than 12 games in a search
     Scenario: For Top Rated games, I can click to view paginated results of games. I can go back to previous results, or forward to later results. I cannot go back when on the first page, and I cannot search beyond the maximum search results.
         Given I am searching for games sorted by <type or category>
         When I scroll to the bottom of the page
         Then I see the 'next' button
         And when I click the 'next' button
-        Then I am taken to the next 10 search results for <type or category>
+        Then I am taken to the next 12 search results for <type or category>
         And when I click the 'back' button
-        Then I am taken back to the prior 10 search results
+        Then I am taken back to the prior 12 search results
         And when I try to view beyond the search count by altering the url
         Then I am taken to an error page with a link to redirect home
     """
@@ -68,15 +70,15 @@ class GamePaginationJourney(BaseTestCase):
         When I scroll to the bottom of the page
         Then I see the 'next' button
         And when I click the 'next' button
-        Then I am taken to the next 10 search results for <type or category>
+        Then I am taken to the next 12 search results for <type or category>
         """ 
         self.signup()
         self.login()
-        #we can see the number 1 game, but not the number 11 game 
+        #we can see the number 1 game and, 12 to a page, the number 11 game
         self.assert_element('a:contains("ROOT")')
-        #we see that we are being shown results 1-10 of page 1
-        self.assert_element('p:contains("Showing results 1 - 10")')
-        self.assert_element_absent('a:contains("THE CASTLES OF BURGUNDY")')
+        #we see that we are being shown results 1-12 of page 1
+        self.assert_element('p:contains("Showing results 1 - 12")')
+        self.assert_element('a:contains("THE CASTLES OF BURGUNDY")')
         #we scroll to the bottom of the page
         self.scroll_to_bottom()
 
@@ -85,13 +87,13 @@ class GamePaginationJourney(BaseTestCase):
         self.assert_element_absent("#back-btn")
         self.click("#next-btn")
 
-        #we are not on page two of search results
+        #we are now on page two of search results; the link carries a ?cursor= token, so only the path is checked
         page_2 = self.get_current_url()
-        self.assert_equal(page_2, base_url+"games/2/Rated")
-        #we see game number 11, but not game number 1
-        self.assert_element('a:contains("THE CASTLES OF BURGUNDY")')
-        #we see that we are being shown results 11-20 of page 2
-        self.assert_element('p:contains("Showing results 11 - 20")')
+        self.assert_equal(urlparse(page_2).path, urlparse(base_url+"games/2/Rated").path)
+        #we see neither game number 1 nor game number 11
+        self.assert_element_absent('a:contains("THE CASTLES OF BURGUNDY")')
+        #we see that we are being shown results 13-24 of page 2
+        self.assert_element('p:contains("Showing results 13 - 24")')
         self.assert_element_absent('a:contains("ROOT")')
 
         #we scroll to the bottom again and see next and back buttons
@@ -102,11 +104,11 @@ class GamePaginationJourney(BaseTestCase):
         #user can now click back to view prior results
         self.click("#back-btn")
 
-        #we can see the number 1 game, but not the number 11 game 
+        #we can see the number 1 game and, 12 to a page, the number 11 game
         self.assert_element('a:contains("ROOT")')
-        #we see that we are being shown results 1-10 of page 1
-        self.assert_element('p:contains("Showing results 1 - 10")')
-        self.assert_element_absent('a:contains("THE CASTLES OF BURGUNDY")')
+        #we see that we are being shown results 1-12 of page 1
+        self.assert_element('p:contains("Showing results 1 - 12")')
+        self.assert_element('a:contains("THE CASTLES OF BURGUNDY")')
         #we scroll to the bottom of the page
         self.scroll_to_bottom()
 
@@ -130,12 +132,12 @@ class GamePaginationJourney(BaseTestCase):
         self.open(base_url+"games/1/Animals")
         self.assert_element('h2:contains("Top Animals Games")')
         animals_page_1 = self.get_current_url()
-        self.assert_equal(animals_page_1, base_url+"games/1/Animals")
-        self.assert_element('p:contains("Showing results 1 - 10")')
+        self.assert_equal(urlparse(animals_page_1).path, urlparse(base_url+"games/1/Animals").path)
+        self.assert_element('p:contains("Showing results 1 - 12")')
 
         #we can update the URL to jump to a page in results
         self.open(base_url+"games/10/Animals")
-        self.assert_element('p:contains("Showing results 91 - 100")')
+        self.assert_element('p:contains("Showing results 109 - 120")')
 
         #but if we go out of bounds we are taken to an error page
         self.open(base_url+"games/999/Animals")
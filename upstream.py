@@ -0,0 +1,65 @@
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+base_url = 'https://api.boardgameatlas.com/api'
+client_id = 'Vk9QEJ2umU'
+
+# Tunable through the environment so gunicorn workers can be sized without code changes
+POOL_SIZE = int(os.environ.get('BGA_POOL_SIZE', 10))
+CONNECT_TIMEOUT = float(os.environ.get('BGA_CONNECT_TIMEOUT', 3.05))
+READ_TIMEOUT = float(os.environ.get('BGA_READ_TIMEOUT', 10))
+MAX_RETRIES = int(os.environ.get('BGA_MAX_RETRIES', 2))
+BACKOFF_FACTOR = float(os.environ.get('BGA_BACKOFF_FACTOR', 0.3))
+
+_session = None
+_session_pid = None
+
+
+def get_session():
+    """Return the pooled keep-alive session for this worker process;
+    a new session is built after a fork so workers never share sockets"""
+    global _session, _session_pid
+
+    if _session is None or _session_pid != os.getpid():
+        retries = Retry(total=MAX_RETRIES,
+                        backoff_factor=BACKOFF_FACTOR,
+                        status_forcelist=(429, 500, 502, 503, 504),
+                        allowed_methods=frozenset(['GET']))
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retries)
+
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+        _session = session
+        _session_pid = os.getpid()
+
+    return _session
+
+
+def bga_get(endpoint, base=base_url):
+    """Receives a BGA endpoint (path and query string) and optionally the base url;
+    makes the GET request over the pooled session and returns the parsed JSON.
+    Raises requests.RequestException on connection errors, timeouts or a bad status"""
+    resp = get_session().get(base + endpoint, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+    resp.raise_for_status()
+    return resp.json()
+
+
+def fetch_bytes(url, max_bytes):
+    """GET an absolute url (such as a game image on the BGA CDN) over the pooled session;
+    returns the body, or raises requests.RequestException on errors, a bad status
+    or a body larger than max_bytes"""
+    with get_session().get(url, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), stream=True) as resp:
+        resp.raise_for_status()
+        chunks = []
+        size = 0
+        for chunk in resp.iter_content(64 * 1024):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > max_bytes:
+                raise requests.RequestException(f'{url} is larger than {max_bytes} bytes')
+    return b''.join(chunks)